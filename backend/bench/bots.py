@@ -0,0 +1,408 @@
+# Load test for the scoring bots.
+# Starts N copies of the Cybernote and SkyRewards challenge apps and a
+# SkyMail stand-in, each "team" on its own loopback address, then starts
+# the bots and drives them the way flags.ts does: each round warms every
+# bot's connections through /warm, then submits each service's round to
+# /inject/stream and reads the verdicts back as they arrive, with the next
+# round starting while the previous one finishes. Reports injections/sec,
+# p50/p99 latency and the CPU/RSS of each bot, so changes to the bots can
+# be compared.
+#
+# Usage: python3 bench/bots.py --teams 20 --rounds 5   (from backend/)
+
+import argparse
+import json
+import os
+import secrets
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(BENCH)
+CHALLENGES = os.path.join(os.path.dirname(BACKEND), "challenges", "challenges")
+
+# Bot script, bot port, team service port and team app (None for the stand-in)
+SERVICES = {
+    "cybernote": (
+        "dockerfiles/82202c6ed1bf107e/flags.py",
+        8080,
+        5000,
+        "cybernote",
+    ),
+    "email": (
+        "dockerfiles/skyline-corp-flag-bot/email_flag_service.py",
+        8081,
+        9999,
+        None,
+    ),
+    "skyrewards": (
+        "dockerfiles/skyline-corp-flag-bot/skyrewards_flag_service.py",
+        8082,
+        5000,
+        "skyrewards/challenge",
+    ),
+}
+
+# How long to wait for a process to start listening (seconds)
+STARTUP_TIMEOUT = 30
+
+# Per-request timeout when driving the bots (seconds)
+REQUEST_TIMEOUT = 60
+
+# Seconds the bots' CPU usage is in per clock tick
+CLOCK_TICK = os.sysconf("SC_CLK_TCK")
+
+
+def wait_for_port(host, port, proc, timeout=STARTUP_TIMEOUT):
+    """
+    Waits until host:port accepts connections, failing early if proc exits.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(proc.args)} exited with {proc.returncode}")
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on {host}:{port} after {timeout}s")
+
+
+def ensure_free(host, port):
+    """
+    Fails if something already answers on host:port, e.g. a service left
+    listening on 0.0.0.0, which would be benchmarked instead.
+    """
+    try:
+        socket.create_connection((host, port), timeout=0.5).close()
+    except OSError:
+        return
+    raise RuntimeError(f"{host}:{port} is already in use")
+
+
+def proc_stat(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        # Fields after the command name, which may itself contain spaces
+        return f.read().rsplit(")", 1)[1].split()
+
+
+def proc_usage(pid):
+    """
+    Returns (cpu seconds, rss MiB) of a process and its children, e.g. a
+    gunicorn master and its workers, using psutil if it is installed and
+    /proc otherwise.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        parent = psutil.Process(pid)
+        cpu = rss = 0
+        for proc in [parent, *parent.children(recursive=True)]:
+            times = proc.cpu_times()
+            cpu += times.user + times.system
+            rss += proc.memory_info().rss
+        return cpu, rss / 2**20
+
+    stats = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                stats[int(entry)] = proc_stat(entry)
+            except OSError:
+                pass
+
+    tree = {pid}
+    for _ in range(len(stats)):
+        children = {p for p, fields in stats.items() if int(fields[1]) in tree}
+        if children <= tree:
+            break
+        tree |= children
+
+    cpu = rss = 0
+    for p in tree & stats.keys():
+        fields = stats[p]
+        cpu += (int(fields[11]) + int(fields[12])) / CLOCK_TICK
+        rss += int(fields[21]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    return cpu, rss
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+class Bench:
+    """
+    Owns the team services and bots started for a run, and stops them all
+    on exit.
+    """
+
+    def __init__(self, teams, services, password, base_ip):
+        # The bots expect fixed ports, so each service's teams get their own
+        # block of addresses: <base_ip>.<service>.<team>
+        self.ips = {
+            service: [f"{base_ip}.{s}.{i}" for i in range(1, teams + 1)]
+            for s, service in enumerate(services, 1)
+        }
+        self.services = services
+        self.password = password
+        self.procs = []
+        self.bots = {}
+        self.workdir = tempfile.mkdtemp(prefix="bot-bench-")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        for proc in self.procs:
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def spawn(self, args, env=None, log="process"):
+        output = open(os.path.join(self.workdir, f"{log}.log"), "wb")
+        proc = subprocess.Popen(
+            args,
+            env={**os.environ, **(env or {})},
+            stdout=output,
+            stderr=subprocess.STDOUT,
+        )
+        self.procs.append(proc)
+        return proc
+
+    def start_teams(self):
+        """
+        Starts every team's copy of the selected services, each in its own
+        directory so their databases are separate.
+        """
+        for service in self.services:
+            _, _, port, app = SERVICES[service]
+            for ip in self.ips[service]:
+                ensure_free(ip, port)
+
+            if app is None:
+                proc = self.spawn(
+                    [
+                        sys.executable,
+                        os.path.join(BENCH, "skymail_standin.py"),
+                        "--password",
+                        self.password,
+                        *self.ips[service],
+                    ],
+                    log=service,
+                )
+                for ip in self.ips[service]:
+                    wait_for_port(ip, port, proc)
+                continue
+
+            for ip in self.ips[service]:
+                copy = os.path.join(self.workdir, f"{service}-{ip}")
+                shutil.copytree(os.path.join(CHALLENGES, app), copy)
+                proc = self.spawn(
+                    [
+                        sys.executable,
+                        os.path.join(BENCH, "serve_app.py"),
+                        os.path.join(copy, "app.py"),
+                        ip,
+                    ],
+                    env={"ADMIN_PASS": self.password, "PORT": str(port)},
+                    log=f"{service}-{ip}",
+                )
+                wait_for_port(ip, port, proc)
+
+    def start_bots(self):
+        for service in self.services:
+            script, bot_port, _, _ = SERVICES[service]
+            ensure_free("127.0.0.1", bot_port)
+            proc = self.spawn(
+                [sys.executable, os.path.join(BACKEND, script)],
+                env={"PYTHONPATH": BACKEND},
+                log=f"bot-{service}",
+            )
+            wait_for_port("127.0.0.1", bot_port, proc)
+            self.bots[service] = (proc, f"http://127.0.0.1:{bot_port}")
+
+    def stream_round(self, session, service, window):
+        """
+        Warms a service's connections and streams its round through
+        /inject/stream, returning (latency, result) per team in team order.
+        Latency runs from submitting the round to the team's final verdict.
+        """
+        _, url = self.bots[service]
+        ips = self.ips[service]
+        try:
+            session.post(f"{url}/warm", json={"ips": ips}, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException:
+            pass
+
+        targets = [
+            {
+                "ip": ip,
+                "flag": f"cybrbtls{{{secrets.token_hex(8)}}}",
+                "password": self.password,
+            }
+            for ip in ips
+        ]
+        results = {}
+        start = time.perf_counter()
+        try:
+            with session.post(
+                f"{url}/inject/stream",
+                json={"targets": targets, "window": window},
+                stream=True,
+                timeout=REQUEST_TIMEOUT + window,
+            ) as response:
+                for line in response.iter_lines():
+                    if line:
+                        result = json.loads(line)
+                        latency = time.perf_counter() - start
+                        results[result["index"]] = (latency, result)
+        except requests.RequestException:
+            pass
+
+        # Teams the stream never reported on count as errors, as in flags.ts
+        missing = (time.perf_counter() - start, {"status": "error"})
+        return [results.get(i, missing) for i in range(len(targets))]
+
+    def run(self, rounds, window, interval):
+        """
+        Runs the given number of rounds, pipelined like flags.ts: a round
+        starts interval seconds after the previous one, once the one before
+        that has finished, so at most two are ever in flight. Returns
+        per-service statistics.
+        """
+        stats = {
+            service: {"latencies": [], "outcomes": {}} for service in self.services
+        }
+        usage = {
+            service: proc_usage(proc.pid) for service, (proc, _) in self.bots.items()
+        }
+        session = requests.Session()
+        session.mount(
+            "http://",
+            requests.adapters.HTTPAdapter(pool_maxsize=4 * len(self.services)),
+        )
+
+        def collect(n, futures):
+            latencies = []
+            for service, future in futures:
+                stat = stats[service]
+                for latency, result in future.result():
+                    latencies.append(latency)
+                    stat["latencies"].append(latency)
+                    outcome = result.get("status", "error")
+                    stat["outcomes"][outcome] = stat["outcomes"].get(outcome, 0) + 1
+            print(f"round {n}: {len(latencies)} injections in {max(latencies):.2f}s")
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2 * len(self.services)) as executor:
+            previous = None
+            for n in range(1, rounds + 1):
+                current = [
+                    (
+                        service,
+                        executor.submit(self.stream_round, session, service, window),
+                    )
+                    for service in self.services
+                ]
+                time.sleep(interval)
+                if previous:
+                    collect(*previous)
+                previous = (n, current)
+            collect(*previous)
+        elapsed = time.perf_counter() - start
+
+        report = {}
+        for service, stat in stats.items():
+            proc, _ = self.bots[service]
+            cpu, rss = proc_usage(proc.pid)
+            latencies = stat["latencies"]
+            report[service] = {
+                "injections": len(latencies),
+                "outcomes": stat["outcomes"],
+                "inj_per_sec": len(latencies) / elapsed,
+                "p50_ms": percentile(latencies, 0.5) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "cpu_s": cpu - usage[service][0],
+                "rss_mib": rss,
+            }
+        return report
+
+
+def print_report(report):
+    print(
+        f"\n{'service':<12}{'inj':>6}{'inj/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+        f"{'cpu s':>8}{'rss MiB':>9}  outcomes"
+    )
+    for service, r in report.items():
+        outcomes = ", ".join(f"{k}={v}" for k, v in sorted(r["outcomes"].items()))
+        print(
+            f"{service:<12}{r['injections']:>6}{r['inj_per_sec']:>9.1f}"
+            f"{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['cpu_s']:>8.2f}"
+            f"{r['rss_mib']:>9.1f}  {outcomes}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the scoring bots")
+    parser.add_argument("--teams", type=int, default=10, help="teams per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument(
+        "--services",
+        default=",".join(SERVICES),
+        help=f"comma separated, from {', '.join(SERVICES)}",
+    )
+    parser.add_argument(
+        "--base-ip",
+        default="127.1",
+        help="teams get <base-ip>.<service>.1 to .N (default 127.1)",
+    )
+    parser.add_argument("--password", default="benchpassword")
+    parser.add_argument(
+        "--window",
+        type=float,
+        default=0,
+        help="seconds each round's injections are spread over (flags.ts uses 60)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0,
+        help="seconds between the starts of rounds (flags.ts waits 120-180)",
+    )
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    services = args.services.split(",")
+    unknown = set(services) - set(SERVICES)
+    if unknown:
+        parser.error(f"Unknown services: {', '.join(sorted(unknown))}")
+
+    with Bench(args.teams, services, args.password, args.base_ip) as bench:
+        bench.start_teams()
+        bench.start_bots()
+        report = bench.run(args.rounds, args.window, args.interval)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,29 @@
+# Runs an unmodified challenge app bound to a single address, for
+# benchmarking the bots. The apps hard-code host="0.0.0.0", so several
+# copies can't share their port; this pins Flask.run to the given host
+# and then runs the app's own __main__ block, DB setup included.
+#
+# Usage: python3 serve_app.py <path/to/app.py> <host>
+
+import os
+import runpy
+import sys
+import flask
+
+app_path, host = sys.argv[1], sys.argv[2]
+
+run = flask.Flask.run
+
+
+def run_on_host(self, *args, **kwargs):
+    kwargs["host"] = host
+    return run(self, *args[1:], **kwargs)
+
+
+flask.Flask.run = run_on_host
+
+# The apps keep their database next to themselves or in the working directory
+os.chdir(os.path.dirname(os.path.abspath(app_path)))
+sys.argv = [app_path]
+sys.path.insert(0, os.getcwd())
+runpy.run_path(app_path, run_name="__main__")
@@ -0,0 +1,94 @@
+# Stand-in for the SkyMail service (tcp 9999), for benchmarking the bots.
+# Speaks the subset of the protocol the scoring bot uses (LOGIN, SEND and
+# READ) with the same replies as server.c, and can listen on several
+# addresses at once so one process plays every team.
+#
+# Usage: python3 skymail_standin.py --password <admin pass> 127.1.2.1 127.1.2.2 ...
+
+import argparse
+import asyncio
+import itertools
+
+PORT = 9999
+
+
+class SkyMail:
+    """
+    In-memory mailboxes shared by every address the stand-in listens on,
+    keyed by address so each "team" has its own.
+    """
+
+    def __init__(self, password):
+        self.password = password
+        self.ids = itertools.count(1)
+        self.mail = {}
+
+    async def handle(self, reader, writer):
+        host = writer.get_extra_info("sockname")[0]
+        user = "guest"
+        logged_in = False
+
+        writer.write(b"220 Welcome to SkyMail 1.0\n")
+        await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                parts = line.decode(errors="replace").split()
+                cmd, args = (parts[0], parts[1:]) if parts else ("", [])
+
+                if cmd == "LOGIN" and args:
+                    if args[0] != "admin":
+                        user, logged_in = args[0], True
+                        reply = f"200 Logged in as {user}"
+                    elif args[1:2] == [self.password]:
+                        user, logged_in = "admin", True
+                        reply = "200 Admin login successful"
+                    else:
+                        reply = "403 Invalid password for admin"
+
+                elif cmd == "SEND" and len(args) >= 2:
+                    if not logged_in:
+                        reply = "500 Login first"
+                    else:
+                        mail_id = next(self.ids)
+                        self.mail[(host, str(mail_id))] = (
+                            f"FROM: {user}\nTO: {args[0]}\nMSG: {args[1]}\n"
+                        )
+                        reply = f"200 Sent (ID: {mail_id})"
+
+                elif cmd == "READ" and args:
+                    content = self.mail.get((host, args[0]))
+                    if not logged_in:
+                        reply = "500 Login first"
+                    elif content is None:
+                        reply = "404 Email ID not found"
+                    else:
+                        reply = f"200 CONTENT:\n{content}\n."
+
+                else:
+                    reply = "500 Unknown Command"
+
+                writer.write(f"{reply}\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def main(hosts, password):
+    skymail = SkyMail(password)
+    servers = [
+        await asyncio.start_server(skymail.handle, host, PORT) for host in hosts
+    ]
+    print(f"SkyMail stand-in listening on {len(servers)} addresses", flush=True)
+    await asyncio.gather(*(server.serve_forever() for server in servers))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--password", required=True, help="admin password")
+    parser.add_argument("hosts", nargs="+", help="addresses to listen on")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.hosts, args.password))
@@ -1,6 +1,6 @@
 docker image build -t 073cbbf5ef263e71 dockerfiles/073cbbf5ef263e71
-docker image build -t 82202c6ed1bf107e dockerfiles/82202c6ed1bf107e
+docker image build --build-context checker=checker -t 82202c6ed1bf107e dockerfiles/82202c6ed1bf107e
 docker image build -t 8429abfca004aed7 dockerfiles/8429abfca004aed7
 docker image build -t er74yzxi22egek75 dockerfiles/er74yzxi22egek75
-docker image build -t skyline-corp-flag-bot dockerfiles/skyline-corp-flag-bot
+docker image build --build-context checker=checker -t skyline-corp-flag-bot dockerfiles/skyline-corp-flag-bot
 docker image pull lscr.io/linuxserver/wireguard:latest
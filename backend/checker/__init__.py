@@ -0,0 +1,16 @@
+# Shared framework for the scoring bots.
+# Each challenge registers a Checker with put/verify hooks; the package
+# provides the HTTP API, concurrency, timeouts, retries and job tracking.
+
+from .base import Checker, CheckFailed, Task, register, get_checker, checkers
+from .runner import Runner
+
+__all__ = [
+    "Checker",
+    "CheckFailed",
+    "Task",
+    "Runner",
+    "register",
+    "get_checker",
+    "checkers",
+]
@@ -0,0 +1,158 @@
+# HTTP API for the scoring bots.
+# Every bot exposes the same endpoints, backed by a Runner for its checker.
+
+import json
+from flask import Flask, Response, request, jsonify
+from . import metrics
+from .runner import ROUND_WINDOW
+
+
+def bad_request():
+    return (
+        jsonify({"status": "error", "message": "Missing required parameters"}),
+        400,
+    )
+
+
+def read_window(data, default):
+    """
+    Returns a request's 'window' in seconds, or None if it isn't valid.
+    """
+    window = data.get("window", default)
+    if not isinstance(window, (int, float)) or window < 0:
+        return None
+    return window
+
+
+def create_app(runner):
+    """
+    Builds the Flask app serving a runner's checker.
+    """
+    app = Flask(runner.checker.name)
+
+    @app.route("/inject", methods=["POST"])
+    def inject():
+        """
+        Injects a single flag. Expects JSON with the checker's required
+        fields, e.g. {"ip": "...", "flag": "...", "password": "..."}, and an
+        optional 'callback' URL for checkers that verify later.
+        """
+        data = request.get_json()
+        if runner.missing_fields(data):
+            return bad_request()
+
+        return jsonify(runner.inject(data))
+
+    @app.route("/inject/batch", methods=["POST"])
+    def inject_batch():
+        """
+        Injects a whole round at once. Expects JSON with 'targets', a list of
+        /inject bodies. Results are returned in request order.
+        """
+        data = request.get_json()
+        if not data or not isinstance(data.get("targets"), list):
+            return bad_request()
+
+        return jsonify(
+            {"status": "success", "results": runner.inject_many(data["targets"])}
+        )
+
+    @app.route("/inject/stream", methods=["POST"])
+    def inject_stream():
+        """
+        Injects a whole round at once and streams each target's final
+        verdict as soon as it is known, deferred verifications included.
+        Expects the same body as /inject/batch, and optionally 'window' in
+        seconds to spread the injections over as /round does. Each result
+        carries its target's 'index'. Responds with JSON lines, or
+        Server-Sent Events if the client accepts text/event-stream.
+        """
+        data = request.get_json()
+        if not data or not isinstance(data.get("targets"), list):
+            return bad_request()
+
+        window = read_window(data, 0)
+        if window is None:
+            return bad_request()
+
+        results = runner.stream(data["targets"], window)
+        headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+        if request.accept_mimetypes.best == "text/event-stream":
+
+            def events():
+                for result in results:
+                    yield f"data: {json.dumps(result)}\n\n"
+                # Lets EventSource clients close instead of reconnecting
+                yield "event: done\ndata: {}\n\n"
+
+            return Response(events(), mimetype="text/event-stream", headers=headers)
+
+        lines = (json.dumps(result) + "\n" for result in results)
+        return Response(lines, mimetype="application/x-ndjson", headers=headers)
+
+    @app.route("/round", methods=["POST"])
+    def schedule_round():
+        """
+        Accepts a whole round and spreads its injections over a window.
+        Expects JSON with 'targets', a list of /inject bodies, and optionally
+        'window' in seconds. Responds straight away with a job per target;
+        verdicts come from /jobs/<job_id> or each target's 'callback'.
+        """
+        data = request.get_json()
+        if not data or not isinstance(data.get("targets"), list):
+            return bad_request()
+
+        window = read_window(data, ROUND_WINDOW)
+        if window is None:
+            return bad_request()
+
+        return jsonify(
+            {
+                "status": "success",
+                "window": window,
+                "results": runner.schedule_round(data["targets"], window),
+            }
+        )
+
+    @app.route("/jobs/<job_id>", methods=["GET"])
+    def job_status(job_id):
+        """
+        Returns the verdict of an injection whose verification was deferred.
+        """
+        payload = runner.job(job_id)
+        if payload is None:
+            return jsonify({"status": "error", "message": "Unknown job"}), 404
+
+        return jsonify(payload)
+
+    @app.route("/warm", methods=["POST"])
+    def warm():
+        """
+        Pre-warms keep-alive connections before a round. Expects JSON:
+        {"ips": ["...", "..."]}
+        """
+        data = request.get_json()
+        if not data or not isinstance(data.get("ips"), list):
+            return bad_request()
+
+        return jsonify({"status": "success", "results": runner.warm(data["ips"])})
+
+    @app.route("/health", methods=["GET"])
+    def health():
+        """
+        Returns the latest healthcheck verdict for every target, for
+        checkers with a healthcheck.
+        """
+        return jsonify({"status": "success", "results": runner.health_results()})
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics_endpoint():
+        """
+        Exposes injection latencies, verdict counters and in-flight gauges
+        in the Prometheus text format.
+        """
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    return app
+
@@ -0,0 +1,179 @@
+# Checker base class and registry for the scoring bots.
+# A challenge's bot subclasses Checker, implements the put/verify hooks
+# and registers itself; the rest of the package provides everything else.
+
+import requests
+from contextlib import contextmanager
+from time import perf_counter
+from . import metrics, timing
+
+# Default per-phase network timeout, and the ceiling for adaptive
+# timeouts (seconds)
+TIMEOUT = 5
+
+checkers = {}
+
+
+class CheckFailed(Exception):
+    """
+    Raised by a checker hook when the team's service answered, but not
+    with what we expected, e.g. the flag is missing or a login was rejected.
+    """
+
+
+class ConnectTimeout(TimeoutError):
+    """
+    Raised when connecting to a team's service times out, so nothing was
+    sent to it yet.
+    """
+
+
+class Checker:
+    """
+    Base class for a challenge's scoring bot.
+
+    Subclasses set 'name' and 'port' and implement put(), and optionally
+    verify(). Both hooks receive a Task describing the target and raise
+    CheckFailed (or let a network exception escape) when something is wrong.
+    """
+
+    # Name of the service, as used in the backend's bot_services config
+    name = None
+
+    # Port the team's service listens on
+    port = None
+
+    # Whether the service speaks HTTP, so connections can be pooled and warmed
+    http = True
+
+    # Fields every /inject request must carry
+    required_fields = ("ip", "flag")
+
+    # Per-phase network timeout (seconds). Phases get less once the
+    # target's usual latency for them is known, see checker.latency.
+    timeout = TIMEOUT
+
+    # How many times a hook is retried after a network error
+    retries = 1
+
+    # Hooks that can safely run again after any network error. The others
+    # are only retried when the error came before anything was sent, since
+    # a request that timed out may still have been carried out.
+    idempotent = ("verify",)
+
+    # (min, max) seconds to wait before verifying, or None to verify
+    # straight after put() within the same request
+    verify_delay = None
+
+    # Seconds between runs of the healthcheck() hook against every known
+    # target, or None if the checker has no healthcheck
+    healthcheck_interval = None
+
+    def put(self, task):
+        """
+        Stores task.flag on the target. The return value is handed to
+        verify() as 'state'.
+        """
+        raise NotImplementedError
+
+    def verify(self, task, state):
+        """
+        Checks the flag stored by put() can be read back.
+        """
+
+    def healthcheck(self, task):
+        """
+        Checks the service still works as intended (SLA), using the fields
+        of the target's latest injection. Runs on its own schedule.
+        """
+
+
+def register(cls):
+    """
+    Class decorator registering a Checker subclass under its name.
+    """
+    if not cls.name:
+        raise ValueError(f"{cls.__name__} has no name")
+    checkers[cls.name] = cls
+    return cls
+
+
+def get_checker(name):
+    """
+    Returns a new instance of the checker registered under name.
+    """
+    if name not in checkers:
+        raise KeyError(f"No checker registered as '{name}'")
+    return checkers[name]()
+
+
+class Task:
+    """
+    A single injection against one target, handed to the checker hooks.
+    """
+
+    def __init__(self, runner, fields):
+        self.runner = runner
+        self.checker = runner.checker
+        self.fields = fields
+        self.ip = fields["ip"]
+        self.flag = fields["flag"]
+        self.password = fields.get("password")
+        self.base_url = f"http://{self.ip}:{self.checker.port}"
+        self.current_phase = None
+        self.elapsed = 0.0
+        # Retries used so far per hook, see Runner.attempt()
+        self.retries = {}
+        # Seconds spent in each phase across retries, split into its total
+        # and any connect, tls and first_byte time, see timing.py
+        self.timings = {}
+
+    @property
+    def timeout(self):
+        """
+        Network timeout for the current phase (seconds), adapted to how
+        quickly this target usually gets through it.
+        """
+        return self.timeout_for(self.current_phase)
+
+    def timeout_for(self, *phases):
+        """
+        Network timeout covering the given phases back to back (seconds),
+        e.g. for a deadline spanning a whole exchange.
+        """
+        return self.runner.latency.timeout(self.ip, phases, self.checker.timeout)
+
+    def session(self):
+        """
+        Returns a requests.Session backed by the target's keep-alive pool.
+        """
+        return self.runner.pools.session(self.base_url)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Marks a step of the exchange, e.g. "signup", so errors can say
+        where they happened. Each phase's duration is recorded in
+        task.timings and metrics and, unless it failed for a reason other
+        than a timeout, feeds the target's adaptive timeouts.
+        """
+        self.current_phase = name
+        phase_timings = self.timings.setdefault(name, {"total": 0})
+        previous = timing.bind(phase_timings)
+        start = perf_counter()
+        try:
+            yield
+        except (TimeoutError, requests.exceptions.Timeout):
+            # A timeout still says the phase takes at least this long
+            self.runner.latency.observe(self.ip, name, perf_counter() - start)
+            raise
+        else:
+            self.runner.latency.observe(self.ip, name, perf_counter() - start)
+        finally:
+            duration = perf_counter() - start
+            timing.bind(previous)
+            phase_timings["total"] += duration
+            metrics.PHASE_DURATION.labels(self.checker.name, name, self.ip).observe(
+                duration
+            )
+        self.current_phase = None
@@ -0,0 +1,134 @@
+# Bounded reads of response bodies for the scoring bots.
+# Teams control what their service sends back, so a patched service could
+# answer with a huge or never-ending page to stall the bot or run it out of
+# memory. Bodies are read in chunks up to MAX_BODY bytes and within the
+# phase's timeout, and checks for the flag stop reading as soon as it turns
+# up rather than loading the whole page first. Every recv is limited to
+# what is left of the timeout, so a service can't drip bytes to dodge it.
+
+import os
+import requests
+from numbers import Number
+from time import monotonic
+from requests.exceptions import ChunkedEncodingError, ContentDecodingError
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError, SSLError
+from .base import CheckFailed
+
+# Largest response body read from a team's service (bytes)
+MAX_BODY = int(os.environ.get("MAX_BODY", 1024 * 1024))
+
+# Bytes read from the socket at a time
+CHUNK_SIZE = 16 * 1024
+
+
+class BodyTooLarge(CheckFailed):
+    """
+    Raised when a response body runs past the size cap.
+    """
+
+
+def chunks(response, limit=MAX_BODY, timeout=None):
+    """
+    Yields a streamed response's body chunk by chunk. Raises BodyTooLarge
+    once more than limit bytes arrive, or TimeoutError if reading takes
+    longer than timeout seconds in total.
+    """
+    length = response.headers.get("Content-Length", "")
+    if length.isdigit() and int(length) > limit:
+        raise BodyTooLarge(f"Response body of {length} bytes is over the limit.")
+
+    if response._content_consumed:
+        # Already read whole, e.g. by a hook
+        if len(response.content) > limit:
+            raise BodyTooLarge(f"Response body is over {limit} bytes.")
+        yield response.content
+        return
+
+    deadline = monotonic() + timeout if timeout else None
+    read = 0
+    while True:
+        # Every recv gets only what is left of the budget, so a service
+        # sending a byte at a time can't stretch the read out
+        if deadline:
+            settimeout(response, deadline - monotonic(), timeout)
+        chunk = read1(response, timeout)
+        if not chunk:
+            response._content_consumed = True
+            return
+        read += len(chunk)
+        if read > limit:
+            raise BodyTooLarge(f"Response body is over {limit} bytes.")
+        yield chunk
+
+
+def settimeout(response, remaining, timeout):
+    """
+    Limits the next read from a streamed response's socket to remaining
+    seconds. urllib3 sets the timeout again for every request, so this
+    doesn't outlast the response.
+    """
+    if remaining <= 0:
+        raise TimeoutError(f"Response body not read within {timeout}s.")
+    sock = getattr(response.raw.connection, "sock", None)
+    if sock is not None:
+        sock.settimeout(remaining)
+
+
+def read1(response, timeout):
+    """
+    Reads whatever part of the body has arrived, up to CHUNK_SIZE bytes,
+    without waiting for a full chunk. urllib3's errors are translated the
+    way requests' iter_content() would, except that a read timeout is a
+    TimeoutError.
+    """
+    try:
+        return response.raw.read1(CHUNK_SIZE, decode_content=True)
+    except ReadTimeoutError as e:
+        raise TimeoutError(f"Response body not read within {timeout}s.") from e
+    except ProtocolError as e:
+        raise ChunkedEncodingError(e) from e
+    except DecodeError as e:
+        raise ContentDecodingError(e) from e
+    except SSLError as e:
+        raise requests.exceptions.SSLError(e) from e
+
+
+def search(response, *needles, limit=MAX_BODY, timeout=None):
+    """
+    Reads a streamed response until one of needles (strings) turns up and
+    returns it, or returns None if the body ends without any of them.
+    Needles found in the same chunk are preferred in the order given.
+    The response is closed afterwards, see chunks() for the limits.
+    """
+    patterns = [(needle, needle.encode()) for needle in needles]
+    # A needle split across two chunks is found in the previous chunk's
+    # tail joined to the next one
+    overlap = max(len(pattern) for _, pattern in patterns) - 1
+
+    tail = b""
+    try:
+        for chunk in chunks(response, limit, timeout):
+            window = tail + chunk
+            for needle, pattern in patterns:
+                if pattern in window:
+                    return needle
+            tail = window[max(len(window) - overlap, 0) :]
+        return None
+    finally:
+        response.close()
+
+
+def cap_body(response, stream=False, timeout=None, **kwargs):
+    """
+    requests response hook applying the limits to bodies that aren't
+    streamed, which requests would otherwise read whole into memory.
+    Redirects are always capped, as requests reads their bodies whole
+    before following them even when streaming.
+    """
+    if stream and not response.is_redirect:
+        return
+    if not isinstance(timeout, Number):
+        # A (connect, read) tuple, only the read part applies to the body
+        timeout = timeout[1] if timeout else None
+    response._content = b"".join(chunks(response, timeout=timeout))
+    response._content_consumed = True
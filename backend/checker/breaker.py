@@ -0,0 +1,93 @@
+# Per-target circuit breaker for the scoring bots.
+# After repeated network failures a target's circuit opens and injections
+# fail straight away, instead of waiting out every phase's timeout. The
+# target is probed again after a backoff that doubles each time it reopens.
+
+import os
+import threading
+from time import time
+
+# Consecutive network failures before a target's circuit opens
+FAILURE_THRESHOLD = int(os.environ.get("BREAKER_THRESHOLD", 3))
+
+# Backoff before the first probe of an open circuit (seconds)
+BASE_BACKOFF = int(os.environ.get("BREAKER_BACKOFF", 15))
+
+# Upper bound on the backoff (seconds)
+MAX_BACKOFF = int(os.environ.get("BREAKER_MAX_BACKOFF", 600))
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures per target. A target is closed (injections
+    run), open (injections are refused until retry_at) or half-open (one
+    probe injection is let through to see if it came back).
+    """
+
+    def __init__(
+        self,
+        threshold=FAILURE_THRESHOLD,
+        base_backoff=BASE_BACKOFF,
+        max_backoff=MAX_BACKOFF,
+    ):
+        self.threshold = threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.targets = {}
+        self.lock = threading.Lock()
+
+    def state(self, target):
+        return self.targets.setdefault(
+            target, {"failures": 0, "opens": 0, "retry_at": None, "probing": False}
+        )
+
+    def allow(self, target):
+        """
+        Returns None if an injection against target may run, otherwise the
+        seconds left until the target is probed again.
+        """
+        now = time()
+        with self.lock:
+            state = self.state(target)
+            if state["retry_at"] is None:
+                return None
+            if now >= state["retry_at"] and not state["probing"]:
+                state["probing"] = True
+                return None
+            return max(state["retry_at"] - now, 0)
+
+    def is_open(self, target):
+        """
+        Returns True if target's circuit is open or half-open.
+        """
+        with self.lock:
+            return self.state(target)["retry_at"] is not None
+
+    def success(self, target):
+        """
+        Records a target that answered. Returns True if this closed its
+        circuit.
+        """
+        with self.lock:
+            state = self.state(target)
+            was_open = state["retry_at"] is not None
+            state.update(failures=0, opens=0, retry_at=None, probing=False)
+            return was_open
+
+    def failure(self, target):
+        """
+        Records a target that could not be reached. Returns True if this
+        opened its circuit.
+        """
+        with self.lock:
+            state = self.state(target)
+            was_open = state["retry_at"] is not None
+            state["failures"] += 1
+
+            if state["probing"] or (
+                not was_open and state["failures"] >= self.threshold
+            ):
+                backoff = min(self.base_backoff * 2 ** state["opens"], self.max_backoff)
+                state.update(retry_at=time() + backoff, probing=False)
+                state["opens"] += 1
+            return not was_open and state["retry_at"] is not None
@@ -0,0 +1,148 @@
+# Offline bulk runs of the scoring bots' checkers, without the HTTP layer.
+# Reads a round from a JSON or CSV file of (ip, service, flag, password)
+# rows, runs it through each service's Runner and writes one JSON line per
+# injection, with its verdict and per-phase timings. Handy for rehearsals,
+# capacity tests and smoke-testing freshly built images.
+#
+# Usage (from backend/):
+#   python3 -m checker.bulk targets.csv \
+#       --checker dockerfiles/82202c6ed1bf107e/flags.py \
+#       --checker dockerfiles/skyline-corp-flag-bot/email_flag_service.py
+
+import argparse
+import csv
+import importlib.util
+import json
+import os
+import sys
+import threading
+from collections import Counter
+from time import perf_counter
+
+from .base import checkers, get_checker
+from .runner import MAX_WORKERS, Runner
+
+FIELDS = ("ip", "service", "flag", "password")
+
+
+def load_checker(path):
+    """
+    Imports a bot script by path so its checkers register themselves. The
+    script's directory goes on sys.path for its sibling modules, and its
+    __main__ block is not run.
+    """
+    path = os.path.abspath(path)
+    sys.path.insert(0, os.path.dirname(path))
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+
+
+def read_targets(path):
+    """
+    Reads injections from a JSON list of objects or a CSV file with a
+    header row, keeping the fields in FIELDS that are set.
+    """
+    with open(path, newline="") as f:
+        if path.endswith(".json"):
+            rows = json.load(f)
+        else:
+            rows = list(csv.DictReader(f))
+
+    return [
+        {field: str(row[field]) for field in FIELDS if row.get(field)} for row in rows
+    ]
+
+
+def run_service(runner, targets, write):
+    """
+    Streams a service's injections through its runner, writing each final
+    verdict as it arrives.
+    """
+    for result in runner.stream(targets):
+        target = targets[result.pop("index")]
+        write({"service": runner.checker.name, "flag": target.get("flag"), **result})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run a round of injections from a targets file"
+    )
+    parser.add_argument(
+        "targets", help="JSON or CSV file of ip, service, flag, password"
+    )
+    parser.add_argument(
+        "--checker",
+        action="append",
+        default=[],
+        metavar="PATH",
+        help="bot script defining checkers, may be repeated",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=MAX_WORKERS,
+        help="concurrent injections per service",
+    )
+    parser.add_argument(
+        "--no-verify-delay",
+        action="store_true",
+        help="verify straight after put, even for checkers that wait",
+    )
+    parser.add_argument("--output", help="JSON lines file (default stdout)")
+    args = parser.parse_args(argv)
+
+    for path in args.checker:
+        load_checker(path)
+
+    targets = read_targets(args.targets)
+    by_service = {}
+    for target in targets:
+        by_service.setdefault(target.get("service"), []).append(target)
+
+    unknown = set(by_service) - set(checkers)
+    if unknown:
+        parser.error(f"No checker loaded for: {', '.join(sorted(map(str, unknown)))}")
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    lock = threading.Lock()
+    verdicts = Counter()
+
+    def write(result):
+        with lock:
+            verdicts[(result["service"], result["status"])] += 1
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+    start = perf_counter()
+    threads = []
+    for service, service_targets in by_service.items():
+        checker = get_checker(service)
+        if args.no_verify_delay:
+            checker.verify_delay = None
+        runner = Runner(checker, max_workers=args.parallel)
+        thread = threading.Thread(
+            target=run_service, args=(runner, service_targets, write)
+        )
+        thread.start()
+        threads.append(thread)
+
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+
+    if args.output:
+        output.close()
+
+    print(f"{len(targets)} injections in {elapsed:.2f}s", file=sys.stderr)
+    for (service, status), count in sorted(verdicts.items()):
+        print(f"  {service}: {count} {status}", file=sys.stderr)
+
+    return 0 if set(status for _, status in verdicts) <= {"success"} else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
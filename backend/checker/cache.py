@@ -0,0 +1,50 @@
+# Idempotency cache for the scoring bots.
+# Injections are keyed by (ip, service, flag), so a request the backend
+# retries after a timeout joins the injection already running, or gets
+# the stored verdict, instead of hitting the team's service again.
+
+import threading
+from concurrent.futures import Future
+from time import time
+
+# How long a finished injection's verdict is kept (seconds)
+RESULT_TTL = 300
+
+
+class ResultCache:
+    """
+    Futures of in-flight and finished injections, evicted RESULT_TTL
+    seconds after they were started.
+    """
+
+    def __init__(self, ttl=RESULT_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def claim(self, key):
+        """
+        Returns (future, created). If created is True the caller owns the
+        injection and must resolve the future, otherwise it should wait on
+        the future of the injection already started for key.
+        """
+        now = time()
+        with self.lock:
+            expired = [k for k, (_, expires) in self.entries.items() if expires < now]
+            for k in expired:
+                del self.entries[k]
+
+            entry = self.entries.get(key)
+            if entry is not None:
+                return entry[0], False
+
+            future = Future()
+            self.entries[key] = (future, now + self.ttl)
+            return future, True
+
+    def discard(self, key):
+        """
+        Forgets key, so the next claim for it starts a new injection.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
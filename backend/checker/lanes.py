@@ -0,0 +1,155 @@
+# Per-target ordering and bulkheads for the scoring bots.
+# Calls for the same target run in the order they were submitted, at most
+# TARGET_CONCURRENCY at a time, while different targets run in parallel on
+# the shared pool. A deferred verify reserves its place in the target's
+# lane when the put finishes, so the next round's put for that target
+# waits behind it but every other target carries on.
+#
+# Each lane only holds TARGET_QUEUE waiting calls, so a slow team can't
+# tie up more than its share of workers or build an unbounded backlog, and
+# calls only start as fast as the global token bucket allows.
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from .limits import TokenBucket
+
+# Calls running at once against one target. Above 1, a target's calls
+# may finish out of order.
+TARGET_CONCURRENCY = int(os.environ.get("TARGET_CONCURRENCY", 1))
+
+# Calls waiting in one target's lane before new ones are refused
+TARGET_QUEUE = int(os.environ.get("TARGET_QUEUE", 8))
+
+
+class LaneFull(Exception):
+    """
+    Raised when a target already has TARGET_QUEUE calls waiting.
+    """
+
+
+class Slot:
+    """
+    A place in a lane whose call is only known later. The lane holds back
+    everything behind it until fill() is called.
+    """
+
+    def __init__(self, lanes, key):
+        self.lanes = lanes
+        self.key = key
+        self.future = Future()
+        self.call = None
+
+    def fill(self, fn, *args):
+        """
+        Sets the slot's call, letting it run once it reaches the front of
+        its lane. Returns the future of its result.
+        """
+        with self.lanes.lock:
+            self.call = (fn, args)
+        self.lanes.pump(self.key)
+        return self.future
+
+
+class Lanes:
+    """
+    Runs calls on an executor in submission order per key, with at most
+    concurrency of them running per key. Nothing blocks a worker while it
+    waits its turn or for a rate limit token.
+    """
+
+    def __init__(
+        self,
+        executor,
+        scheduler,
+        concurrency=TARGET_CONCURRENCY,
+        max_queue=TARGET_QUEUE,
+        bucket=None,
+    ):
+        self.executor = executor
+        self.scheduler = scheduler
+        self.concurrency = max(concurrency, 1)
+        self.max_queue = max_queue
+        self.bucket = bucket or TokenBucket()
+        self.lanes = {}
+        self.running = {}
+        # Keys with a pump scheduled for when the next token is due
+        self.waiting = set()
+        self.lock = threading.Lock()
+
+    def reserve(self, key, front=False):
+        """
+        Reserves the next place in key's lane, see Slot. A call running in
+        the lane can reserve with front=True to go straight after itself,
+        ahead of anything already queued; those are never refused.
+        Raises LaneFull if the lane already holds max_queue calls.
+        """
+        slot = Slot(self, key)
+        with self.lock:
+            lane = self.lanes.setdefault(key, deque())
+            if front:
+                lane.appendleft(slot)
+            elif self.max_queue and len(lane) >= self.max_queue:
+                raise LaneFull(f"{len(lane)} calls already queued for {key}")
+            else:
+                lane.append(slot)
+        return slot
+
+    def submit(self, key, fn, *args):
+        """
+        Runs fn(*args) after every earlier call for key has started, once
+        key has room. Returns a Future of its result, or raises LaneFull.
+        """
+        return self.reserve(key).fill(fn, *args)
+
+    def pump(self, key, retry=False):
+        """
+        Starts the ready calls at the front of key's lane while key has
+        room and the rate limit allows, otherwise tries again once the
+        next token is due.
+        """
+        while True:
+            with self.lock:
+                if retry:
+                    self.waiting.discard(key)
+                    retry = False
+
+                lane = self.lanes.get(key)
+                running = self.running.get(key, 0)
+                if running >= self.concurrency or not lane or lane[0].call is None:
+                    return
+                if key in self.waiting:
+                    return
+
+                wait = self.bucket.take()
+                if wait:
+                    self.waiting.add(key)
+                    self.scheduler.call_later(wait, self.pump, key, True)
+                    return
+
+                slot = lane.popleft()
+                if not lane:
+                    del self.lanes[key]
+                self.running[key] = running + 1
+            self.executor.submit(self.run, slot)
+
+    def run(self, slot):
+        fn, args = slot.call
+        error = None
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            error = e
+
+        # Free the place before waking whoever waits on the result
+        with self.lock:
+            self.running[slot.key] -= 1
+            if not self.running[slot.key]:
+                del self.running[slot.key]
+        self.pump(slot.key)
+
+        if error is None:
+            slot.future.set_result(result)
+        else:
+            slot.future.set_exception(error)
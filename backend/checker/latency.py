@@ -0,0 +1,67 @@
+# Latency-adaptive timeouts for the scoring bots.
+# Recent phase durations are kept per target, and each phase's timeout is
+# a multiple of its high percentile, clamped between a floor and the
+# checker's timeout. A target that usually answers in milliseconds then
+# fails fast when it hangs, while a slow box keeps a fair budget.
+
+import os
+import threading
+from collections import deque
+
+# Recent samples kept per target and phase
+WINDOW = 50
+
+# Samples needed before a phase's timeout adapts
+MIN_SAMPLES = 5
+
+# Percentile of recent durations the timeout is based on
+PERCENTILE = 0.99
+
+# Multiple of that percentile allowed before timing out
+MULTIPLIER = 3
+
+# Lowest adaptive timeout (seconds)
+TIMEOUT_FLOOR = float(os.environ.get("TIMEOUT_FLOOR", 0.3))
+
+
+class LatencyTracker:
+    """
+    Rolling per-target, per-phase durations and the timeouts derived
+    from them.
+    """
+
+    def __init__(self, floor=TIMEOUT_FLOOR):
+        self.floor = floor
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def observe(self, target, phase, duration):
+        with self.lock:
+            samples = self.samples.get((target, phase))
+            if samples is None:
+                samples = self.samples[(target, phase)] = deque(maxlen=WINDOW)
+            samples.append(duration)
+
+    def percentile(self, target, phase):
+        """
+        Returns the PERCENTILE duration of a phase, or None if there are
+        too few samples.
+        """
+        with self.lock:
+            samples = sorted(self.samples.get((target, phase), ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(int(len(samples) * PERCENTILE), len(samples) - 1)]
+
+    def timeout(self, target, phases, ceiling):
+        """
+        Returns the timeout for a target covering the given phases, falling
+        back to ceiling until every phase has enough samples.
+        """
+        total = 0
+        for phase in phases:
+            latency = self.percentile(target, phase)
+            if latency is None:
+                return ceiling
+            total += latency
+        return min(max(total * MULTIPLIER, self.floor), ceiling)
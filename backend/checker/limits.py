@@ -0,0 +1,46 @@
+# Global rate limit for the scoring bots.
+# A token bucket shared by every target caps how fast calls against team
+# services start, however many rounds or retries pile up at once.
+
+import os
+import threading
+from time import monotonic
+
+# Calls started per second across all targets, 0 for no limit
+RATE_LIMIT = float(os.environ.get("RATE_LIMIT", 0))
+
+# Calls that may start back to back before the rate applies
+RATE_BURST = int(os.environ.get("RATE_BURST", 32))
+
+
+class TokenBucket:
+    """
+    Holds up to burst tokens, refilled at rate tokens per second.
+    """
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_BURST):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Takes a token. Returns 0 if one was available, otherwise the
+        seconds until there will be one (no token is taken).
+        """
+        if not self.rate:
+            return 0
+
+        with self.lock:
+            now = monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
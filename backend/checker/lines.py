@@ -0,0 +1,108 @@
+# Buffered client for line-based TCP protocols.
+# Replies are read line by line from a buffer, so messages split across
+# (or packed into) TCP segments are handled, and the whole exchange runs
+# against a single deadline instead of a fresh timeout on every recv.
+
+import socket
+from time import monotonic, perf_counter
+from . import timing
+from .base import CheckFailed, ConnectTimeout
+
+BUFFER_SIZE = 4096
+
+# Longest line accepted from a team's service (bytes)
+MAX_LINE = 64 * 1024
+
+
+class LineClient:
+    """
+    A TCP connection with a line reader and an overall deadline. Use as a
+    context manager to close the connection.
+    """
+
+    def __init__(self, sock, deadline, max_line=MAX_LINE):
+        self.sock = sock
+        self.deadline = deadline
+        self.max_line = max_line
+        self.buffer = bytearray()
+        # When the last message (or the connect, for a banner) was sent,
+        # until its reply starts arriving
+        self.sent_at = perf_counter()
+
+    @classmethod
+    def connect(cls, host, port, timeout):
+        """
+        Connects to host:port, allowing timeout seconds for the connect and
+        every exchange on the connection after it.
+        """
+        deadline = monotonic() + timeout
+        start = perf_counter()
+        try:
+            sock = socket.create_connection((host, port), timeout=timeout)
+        except socket.timeout as e:
+            raise ConnectTimeout(f"Connect to {host}:{port} timed out.") from e
+        timing.record("connect", perf_counter() - start)
+        return cls(sock, deadline)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.sock.close()
+
+    def remaining(self):
+        """
+        Seconds left before the deadline, raising TimeoutError once it passed.
+        """
+        remaining = self.deadline - monotonic()
+        if remaining <= 0:
+            raise TimeoutError("Exchange deadline exceeded.")
+        return remaining
+
+    def send(self, *lines):
+        """
+        Sends one or more lines in a single write, so several commands can
+        be pipelined ahead of their replies.
+        """
+        self.sock.settimeout(self.remaining())
+        self.sock.sendall("".join(f"{line}\n" for line in lines).encode())
+        self.sent_at = perf_counter()
+
+    def readline(self):
+        """
+        Returns the next line, without its line ending.
+        """
+        while True:
+            end = self.buffer.find(b"\n")
+            if end >= 0:
+                line = bytes(self.buffer[:end])
+                del self.buffer[: end + 1]
+                return line.rstrip(b"\r").decode(errors="replace")
+
+            if len(self.buffer) > self.max_line:
+                raise CheckFailed(f"Line longer than {self.max_line} bytes.")
+
+            self.sock.settimeout(self.remaining())
+            chunk = self.sock.recv(BUFFER_SIZE)
+            if self.sent_at is not None:
+                timing.record("first_byte", perf_counter() - self.sent_at)
+                self.sent_at = None
+            if not chunk:
+                raise ConnectionError("Connection closed by server.")
+            self.buffer += chunk
+
+    def read_until(self, terminator, max_lines=1000):
+        """
+        Returns the lines up to, but not including, the terminator line.
+        """
+        lines = []
+        while True:
+            line = self.readline()
+            if line == terminator:
+                return lines
+            if len(lines) >= max_lines:
+                raise CheckFailed(f"More than {max_lines} lines before terminator.")
+            lines.append(line)
@@ -0,0 +1,151 @@
+# Structured logs for the scoring bots.
+# Log records carry an 'event' dict (passed as extra={"event": ...}) and
+# are written as one JSON object per line, so they can be filtered and
+# aggregated rather than grepped.
+#
+# Records are handed to a background thread through a bounded queue, so
+# logging never blocks an injection; if the queue is full the record is
+# dropped and counted instead. With an event log file configured, every
+# injection goes to that file, rotated by size and age so week-long
+# sessions can't fill the disk, and only warnings go to stderr. The file
+# is flushed at most once a second while records keep coming, and as soon
+# as the queue runs dry, so the last records before a lull aren't held back.
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from time import monotonic, time
+from . import metrics
+
+log = logging.getLogger("checker")
+
+# Records waiting to be written before new ones are dropped
+QUEUE_SIZE = 10000
+
+# Event log file size that triggers a rotation (bytes)
+EVENT_LOG_MAX_BYTES = int(os.environ.get("EVENT_LOG_MAX_BYTES", 50 * 1024 * 1024))
+
+# Age of the event log file that triggers a rotation (seconds)
+EVENT_LOG_INTERVAL = int(os.environ.get("EVENT_LOG_INTERVAL", 24 * 60 * 60))
+
+# Rotated event log files kept
+EVENT_LOG_BACKUPS = int(os.environ.get("EVENT_LOG_BACKUPS", 10))
+
+# Longest the event log's write buffer is held before flushing (seconds)
+FLUSH_INTERVAL = 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+            **getattr(record, "event", {}),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class EventFileHandler(RotatingFileHandler):
+    """
+    A RotatingFileHandler that also rotates once the file is interval
+    seconds old, and flushes its buffer at most every FLUSH_INTERVAL
+    rather than after every record, unless forced.
+    """
+
+    def __init__(self, path, max_bytes, interval, backup_count):
+        super().__init__(
+            path,
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        self.interval = interval
+        self.rollover_at = time() + interval
+        self.last_flush = monotonic()
+
+    def shouldRollover(self, record):
+        if self.interval and time() >= self.rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time() + self.interval
+
+    def flush(self, force=False):
+        now = monotonic()
+        if force or now - self.last_flush >= FLUSH_INTERVAL:
+            super().flush()
+            self.last_flush = now
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    A QueueHandler that drops records when the queue is full, rather than
+    blocking or raising in the caller.
+    """
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.DROPPED_LOG_RECORDS.labels().inc()
+
+
+class FlushingQueueListener(QueueListener):
+    """
+    A QueueListener that forces the event log's buffer out whenever it has
+    written everything queued, before waiting for the next record.
+    """
+
+    def dequeue(self, block):
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                if isinstance(handler, EventFileHandler):
+                    handler.flush(force=True)
+        return super().dequeue(block)
+
+
+def setup_logging(event_log=None, stream=sys.stderr):
+    """
+    Starts writing the bots' logs as JSON lines from a background thread:
+    to event_log, if given, with warnings also going to stream, or
+    otherwise everything to stream. event_log may contain {pid}, which
+    keeps the files of separate worker processes apart.
+
+    Call this in each process that logs, as the writer thread doesn't
+    survive a fork.
+    """
+    formatter = JsonFormatter()
+
+    console = logging.StreamHandler(stream)
+    console.setFormatter(formatter)
+    handlers = [console]
+
+    if event_log:
+        console.setLevel(logging.WARNING)
+        path = event_log.format(pid=os.getpid())
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        events = EventFileHandler(
+            path, EVENT_LOG_MAX_BYTES, EVENT_LOG_INTERVAL, EVENT_LOG_BACKUPS
+        )
+        events.setFormatter(formatter)
+        handlers.append(events)
+
+    records = queue.Queue(QUEUE_SIZE)
+    listener = FlushingQueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    log.addHandler(DroppingQueueHandler(records))
+    log.setLevel(logging.INFO)
+    log.propagate = False
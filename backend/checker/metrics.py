@@ -0,0 +1,192 @@
+# Prometheus-style metrics for the scoring bots.
+# A small in-process registry rendered in the Prometheus text format by
+# the /metrics endpoint, so bots don't need an extra dependency.
+
+import threading
+
+# Histogram bucket upper bounds (seconds)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+registry = []
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    """
+    A named metric with a fixed set of label names. Call labels() with the
+    label values to get the child to update.
+    """
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        with self.lock:
+            child = self.children.get(values)
+            if child is None:
+                child = self.children[values] = self.new_child()
+            return child
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+        ]
+        with self.lock:
+            children = list(self.children.items())
+        for values, child in children:
+            lines.extend(child.samples(self, values))
+        return lines
+
+
+class Value:
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def samples(self, metric, values):
+        labels = format_labels(metric.labelnames, values)
+        return [f"{metric.name}{labels} {self.value}"]
+
+
+class Buckets:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, amount):
+        with self.lock:
+            for i, bound in enumerate(BUCKETS):
+                if amount <= bound:
+                    self.counts[i] += 1
+            self.count += 1
+            self.sum += amount
+
+    def samples(self, metric, values):
+        with self.lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+
+        lines = []
+        for bound, bucket_count in zip(BUCKETS, counts):
+            labels = format_labels(metric.labelnames, values, [("le", bound)])
+            lines.append(f"{metric.name}_bucket{labels} {bucket_count}")
+        labels = format_labels(metric.labelnames, values, [("le", "+Inf")])
+        lines.append(f"{metric.name}_bucket{labels} {count}")
+
+        labels = format_labels(metric.labelnames, values)
+        lines.append(f"{metric.name}_sum{labels} {total}")
+        lines.append(f"{metric.name}_count{labels} {count}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+    new_child = Value
+
+
+class Gauge(Metric):
+    type = "gauge"
+    new_child = Value
+
+
+class Histogram(Metric):
+    type = "histogram"
+    new_child = Buckets
+
+
+def render():
+    """
+    Returns every registered metric in the Prometheus text format.
+    """
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+INJECTIONS = Counter(
+    "checker_injections_total",
+    "Finished injections by verdict (success, failure, timeout, error, "
+    "circuit_open or rejected).",
+    ["service", "target", "outcome"],
+)
+
+INJECTION_DURATION = Histogram(
+    "checker_injection_duration_seconds",
+    "Time spent in put and verify for an injection, excluding any verify delay.",
+    ["service", "target"],
+)
+
+DUPLICATE_INJECTIONS = Counter(
+    "checker_duplicate_injections_total",
+    "Repeated injections answered from the idempotency cache.",
+    ["service"],
+)
+
+HEALTHCHECKS = Counter(
+    "checker_healthchecks_total",
+    "Finished healthchecks by verdict (success, failure, timeout or error).",
+    ["service", "target", "outcome"],
+)
+
+PHASE_DURATION = Histogram(
+    "checker_phase_duration_seconds",
+    "Time spent in each phase of an injection.",
+    ["service", "phase", "target"],
+)
+
+IN_FLIGHT = Gauge(
+    "checker_in_flight",
+    "Checker hooks currently running, by stage (put, verify or healthcheck).",
+    ["service", "stage"],
+)
+
+PENDING_VERIFICATIONS = Gauge(
+    "checker_pending_verifications",
+    "Injections waiting for their deferred verification.",
+    ["service"],
+)
+
+SCHEDULED_INJECTIONS = Gauge(
+    "checker_scheduled_injections",
+    "Injections from scheduled rounds waiting for their slot.",
+    ["service"],
+)
+
+OPEN_CIRCUITS = Gauge(
+    "checker_open_circuits",
+    "Targets whose circuit breaker is open after repeated network failures.",
+    ["service"],
+)
+
+DROPPED_LOG_RECORDS = Counter(
+    "checker_dropped_log_records_total",
+    "Log records dropped because the log writer fell behind.",
+)
@@ -0,0 +1,116 @@
+# Keep-alive HTTP connection pools for the scoring bots.
+# A pool is kept per target for the whole session, so rounds after the
+# first reuse already-open TCP connections instead of handshaking again.
+# That only pays off for services that keep connections open: Flask's
+# development server, which most challenges run on, answers every request
+# with "Connection: close". Such targets are noted from their responses
+# and not warmed, as nothing would be left open for the round to reuse.
+
+import os
+import threading
+import requests
+from functools import partial
+from time import time
+from .body import cap_body
+from .timing import TimedHTTPAdapter
+
+# Maximum number of keep-alive connections kept open per target
+POOL_SIZE = int(os.environ.get("POOL_SIZE", 4))
+
+# Pools not used for this many seconds are closed and dropped
+POOL_IDLE_TIMEOUT = int(os.environ.get("POOL_IDLE_TIMEOUT", 600))
+
+
+def keeps_alive(response):
+    """
+    Whether the server left the response's connection open for reuse.
+    """
+    connection = response.headers.get("Connection", "").lower()
+    if response.raw.version == 10:
+        return "keep-alive" in connection
+    return "close" not in connection
+
+
+class TargetPools:
+    """
+    Holds one urllib3 connection pool (via a requests HTTPAdapter) per
+    target base URL and evicts the ones that have gone idle.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, idle_timeout=POOL_IDLE_TIMEOUT):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.adapters = {}
+        self.last_used = {}
+        self.last_sweep = time()
+        # Targets whose last response closed its connection
+        self.closing = set()
+        self.lock = threading.Lock()
+
+    def adapter(self, base_url):
+        """
+        Returns the shared adapter for a target, creating it if needed.
+        """
+        now = time()
+        with self.lock:
+            if now - self.last_sweep > self.idle_timeout:
+                self._evict_idle(now)
+
+            adapter = self.adapters.get(base_url)
+            if adapter is None:
+                adapter = TimedHTTPAdapter(
+                    pool_connections=1, pool_maxsize=self.pool_size, max_retries=0
+                )
+                self.adapters[base_url] = adapter
+            self.last_used[base_url] = now
+            return adapter
+
+    def session(self, base_url):
+        """
+        Returns a fresh requests.Session whose connections to base_url come
+        from the target's shared pool. Cookies stay per session, so
+        concurrent injections against the same target don't interfere.
+        Response bodies are capped, see checker.body.
+
+        Don't close the returned session (or use it as a context manager),
+        as that would close the shared pool with it.
+        """
+        s = requests.Session()
+        s.mount(f"{base_url}/", self.adapter(base_url))
+        s.hooks["response"].append(cap_body)
+        s.hooks["response"].append(partial(self.observe, base_url))
+        return s
+
+    def observe(self, base_url, response, **kwargs):
+        """
+        requests response hook noting whether the target keeps its
+        connections open.
+        """
+        with self.lock:
+            if keeps_alive(response):
+                self.closing.discard(base_url)
+            else:
+                self.closing.add(base_url)
+
+    def warm(self, base_url, timeout=5):
+        """
+        Opens a keep-alive connection to the target ahead of a round,
+        unless it is known to close its connections.
+        """
+        if base_url in self.closing:
+            return "SKIPPED"
+        try:
+            self.session(base_url).head(
+                f"{base_url}/", allow_redirects=False, timeout=timeout
+            )
+            return "SUCCESS"
+        except requests.exceptions.RequestException as e:
+            return f"Error: {e}"
+
+    def _evict_idle(self, now):
+        for base_url, last_used in list(self.last_used.items()):
+            if now - last_used > self.idle_timeout:
+                self.adapters.pop(base_url).close()
+                del self.last_used[base_url]
+                self.closing.discard(base_url)
+        self.last_sweep = now
@@ -0,0 +1,664 @@
+# Runs checker hooks for the scoring bots.
+# The runner owns the worker pool, retries, timeouts, connection pools,
+# deferred verification and job tracking, so checkers only describe the
+# exchange with the team's service.
+
+import hashlib
+import os
+import queue
+import random
+import threading
+import uuid
+import requests
+from functools import partial
+from urllib3.exceptions import NewConnectionError
+from time import perf_counter, time
+from concurrent.futures import Future, ThreadPoolExecutor
+from . import metrics
+from .base import CheckFailed, ConnectTimeout, Task
+from .breaker import CircuitBreaker
+from .cache import ResultCache
+from .lanes import LaneFull, Lanes
+from .log import log
+from .latency import LatencyTracker
+from .pool import TargetPools
+from .scheduler import Scheduler
+
+# Upper bound on concurrent injections and verifications
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", 32))
+
+# How long finished jobs are kept around for /jobs lookups (seconds)
+JOB_TTL = 900
+
+# Default window a scheduled round's injections are spread over (seconds)
+ROUND_WINDOW = int(os.environ.get("ROUND_WINDOW", 60))
+
+# Delay before the first retry, doubled for every retry after it (seconds)
+RETRY_BACKOFF = 0.5
+
+# Errors worth retrying, anything else is reported straight away
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+)
+
+
+def unsent(e):
+    """
+    Whether a network error was raised before anything reached the team's
+    service, i.e. the connection was refused or never set up in time.
+    """
+    if isinstance(
+        e, (ConnectionRefusedError, ConnectTimeout, requests.exceptions.ConnectTimeout)
+    ):
+        return True
+    # requests wraps urllib3's errors, the connect failure is their reason
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class RetryLater(Exception):
+    """
+    Raised by Runner.attempt() when a hook hit a network error and should
+    run again after delay seconds.
+    """
+
+    def __init__(self, delay):
+        super().__init__(f"Retrying in {delay}s")
+        self.delay = delay
+
+
+def settle(target, source):
+    """
+    Copies the outcome of the source future onto target. If source resolved
+    to another future, e.g. for a call that went on after a retry, target
+    waits for that one instead.
+    """
+    e = source.exception()
+    if e is not None:
+        target.set_exception(e)
+    elif isinstance(source.result(), Future):
+        source.result().add_done_callback(partial(settle, target))
+    else:
+        target.set_result(source.result())
+
+
+def timings(task):
+    """
+    Returns a task's per-phase timings for a response payload, in
+    milliseconds.
+    """
+    return {
+        phase: {kind: round(seconds * 1000, 1) for kind, seconds in split.items()}
+        for phase, split in task.timings.items()
+    }
+
+
+def describe_error(e):
+    """
+    Maps an exception raised by a checker hook to an (outcome, message) pair,
+    where outcome is one of "failure", "timeout" or "error".
+    """
+    if isinstance(e, CheckFailed):
+        return "failure", f"FAILURE: {e}"
+    if isinstance(e, (TimeoutError, requests.exceptions.Timeout)):
+        return "timeout", "Error: Connection timed out."
+    if isinstance(e, ConnectionRefusedError):
+        return "error", "Error: Connection refused. Check IP/Port."
+    return "error", f"Error: {e}"
+
+
+class Runner:
+    """
+    Executes injections for one checker.
+    """
+
+    def __init__(self, checker, max_workers=MAX_WORKERS):
+        self.checker = checker
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.scheduler = Scheduler(self.executor)
+        self.lanes = Lanes(self.executor, self.scheduler)
+        self.pools = TargetPools()
+        self.jobs = {}
+        self.jobs_lock = threading.Lock()
+        self.results = ResultCache()
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+
+        # Latest injection per target and healthcheck state, keyed by ip
+        self.targets = {}
+        self.health = {}
+        self.health_running = set()
+        self.health_lock = threading.Lock()
+
+        if self.checker.healthcheck_interval:
+            self.scheduler.call_later(
+                self.checker.healthcheck_interval, self.run_healthchecks
+            )
+
+    def missing_fields(self, fields):
+        """
+        Returns True if a request body lacks any of the checker's fields.
+        """
+        return not isinstance(fields, dict) or not all(
+            field in fields for field in self.checker.required_fields
+        )
+
+    def inject(self, fields, job_id=None):
+        """
+        Puts a flag on the target and verifies it, either straight away or
+        after the checker's verify_delay. Returns the response payload. If
+        job_id is given, the injection's verdict is stored on that job.
+        """
+        return self.submit(fields, job_id).result()
+
+    def submit(self, fields, job_id=None):
+        """
+        Starts an injection and returns a Future of its response payload,
+        see inject(). Injections run in their target's lane, so a target's
+        next put waits for its previous verify while other targets go on.
+
+        Repeats of an injection (same ip, service and flag) join the one
+        already running, or get its stored result, rather than running again.
+        """
+        key = (fields["ip"], self.checker.name, fields["flag"])
+        future, created = self.results.claim(key)
+
+        if not created:
+            metrics.DUPLICATE_INJECTIONS.labels(self.checker.name).inc()
+            joined = Future()
+            future.add_done_callback(partial(self.join_injection, job_id, joined))
+            return joined
+
+        try:
+            running = self.lanes.submit(
+                fields["ip"], self.run_injection, fields, job_id
+            )
+        except LaneFull as e:
+            # Not cached, so the injection can be retried once the lane drains
+            self.results.discard(key)
+            future.set_result(self.reject(fields, job_id, e))
+            return future
+
+        running.add_done_callback(partial(settle, future))
+        return future
+
+    def reject(self, fields, job_id, e):
+        """
+        Fails an injection refused because its target has too many queued.
+        """
+        message = "Error: Too many injections queued for target, try again later."
+        self.record(Task(self, fields), "rejected", message, type(e).__name__)
+        return self.complete_job(job_id, {"status": "failure", "message": message})
+
+    def join_injection(self, job_id, joined, future):
+        """
+        Completes a repeated injection with the verdict of the original. If
+        the original's verify is deferred, the repeat's job follows the
+        original's job and finishes with it.
+        """
+        try:
+            result = future.result()
+        except BaseException as e:
+            joined.set_exception(e)
+            return
+
+        original = result.get("job_id")
+        if result["status"] != "pending" or original is None:
+            joined.set_result(self.complete_job(job_id, result))
+            return
+
+        if job_id is None:
+            joined.set_result(result)
+            return
+        self.follow_job(original, partial(self.complete_job, job_id))
+        joined.set_result({"status": "pending", "job_id": job_id})
+
+    def run_injection(self, fields, job_id):
+        """
+        Runs an injection's put and verify hooks, see inject().
+        """
+        task = Task(self, fields)
+
+        with self.health_lock:
+            self.targets[task.ip] = fields
+
+        # Fail fast while the target is known to be down
+        wait = self.breaker.allow(task.ip)
+        if wait is not None:
+            message = f"Error: Target unreachable, retrying in {wait:.0f}s."
+            self.record(task, "circuit_open", message, "CircuitOpen")
+            return self.complete_job(job_id, {"status": "failure", "message": message})
+
+        return self.put(task, job_id)
+
+    def put(self, task, job_id):
+        """
+        Runs the checker's put hook, then verifies straight away or defers
+        the verify, see inject().
+        """
+        try:
+            state = self.attempt("put", task)
+        except RetryLater as retry:
+            return self.later(task, retry.delay, self.put, task, job_id)
+        except Exception as e:
+            return self.complete_job(job_id, self.failed(task, e))
+
+        if self.checker.verify_delay is None:
+            return self.verify(task, state, job_id)
+
+        if job_id is None:
+            job_id = self.create_job(task.fields)
+        self.defer_verify(job_id, task, state)
+        # Only the verdict counts as a success, the flag may not read back
+        return {"status": "pending", "job_id": job_id}
+
+    def inject_many(self, targets):
+        """
+        Runs a list of injections concurrently, returning a payload for each
+        target in the same order.
+        """
+        futures = [None if self.missing_fields(t) else self.submit(t) for t in targets]
+
+        results = []
+        for target, future in zip(targets, futures):
+            if future is None:
+                results.append(
+                    {"status": "error", "message": "Missing required parameters"}
+                )
+                continue
+            results.append({"ip": target["ip"], **future.result()})
+        return results
+
+    def stream(self, targets, window=0):
+        """
+        Runs a list of injections, spread over window seconds as by
+        schedule_round() or all at once by default, yielding a payload for
+        each target as its final verdict is known, deferred verifications
+        included. Payloads carry the target's index in the list.
+        """
+        done = queue.Queue()
+        scheduled = self.schedule_round(
+            targets, window, listener=lambda index, result: done.put((index, result))
+        )
+
+        pending = 0
+        for index, result in enumerate(scheduled):
+            if result["status"] == "error":
+                yield {"index": index, **result}
+                continue
+            pending += 1
+
+        for _ in range(pending):
+            index, result = done.get()
+            yield {"index": index, "ip": targets[index]["ip"], **result}
+
+    def verify(self, task, state, job_id=None):
+        """
+        Runs the checker's verify hook and stores the verdict on the job, if
+        there is one. Returns the response payload.
+        """
+        try:
+            self.attempt("verify", task, state)
+        except RetryLater as retry:
+            return self.later(task, retry.delay, self.verify, task, state, job_id)
+        except Exception as e:
+            return self.complete_job(job_id, self.failed(task, e))
+
+        self.record(task, "success")
+        return self.complete_job(
+            job_id,
+            {
+                "status": "success",
+                "elapsed": round(task.elapsed * 1000, 1),
+                "timings": timings(task),
+            },
+        )
+
+    def attempt(self, stage, task, *args):
+        """
+        Calls a checker hook ("put", "verify" or "healthcheck") once. On a
+        network error worth retrying, raises RetryLater with the backoff,
+        which doubles on every retry. Hooks that aren't idempotent are only
+        retried if the error came before anything was sent.
+        """
+        hook = getattr(self.checker, stage)
+        in_flight = metrics.IN_FLIGHT.labels(self.checker.name, stage)
+        retries = task.retries.get(stage, 0)
+
+        in_flight.inc()
+        start = perf_counter()
+        task.current_phase = None
+        try:
+            return hook(task, *args)
+        except TRANSIENT_ERRORS as e:
+            if retries == self.checker.retries:
+                raise
+            if stage not in self.checker.idempotent and not unsent(e):
+                raise
+            task.retries[stage] = retries + 1
+            raise RetryLater(RETRY_BACKOFF * 2**retries) from e
+        finally:
+            task.elapsed += perf_counter() - start
+            in_flight.dec()
+
+    def later(self, task, delay, fn, *args):
+        """
+        Runs fn(*args) in the target's lane after delay seconds, in the place
+        right behind the running call, so nothing for the target overtakes
+        it but no worker or lane slot is held while it waits. Returns the
+        Future of its result.
+        """
+        slot = self.lanes.reserve(task.ip, front=True)
+        self.scheduler.call_later(delay, slot.fill, fn, *args)
+        return slot.future
+
+    def describe(self, task, e):
+        """
+        Returns the (outcome, message) pair for an exception raised by a hook,
+        naming the phase it was raised in.
+        """
+        outcome, message = describe_error(e)
+        if task.current_phase:
+            message = f"{message} (during {task.current_phase})"
+        return outcome, message
+
+    def failed(self, task, e):
+        """
+        Builds the failure payload for an exception raised by a hook.
+        """
+        outcome, message = self.describe(task, e)
+
+        unreachable = isinstance(e, TRANSIENT_ERRORS)
+        self.record(task, outcome, message, type(e).__name__, unreachable)
+        return {
+            "status": "failure",
+            "message": message,
+            "elapsed": round(task.elapsed * 1000, 1),
+            "timings": timings(task),
+        }
+
+    def record(
+        self, task, outcome, message=None, error_class=None, unreachable=False
+    ):
+        """
+        Counts and logs a finished injection and how long its hooks took,
+        and feeds the outcome to the target's circuit breaker, where
+        unreachable says it failed with a network error.
+        """
+        name = self.checker.name
+        metrics.INJECTIONS.labels(name, task.ip, outcome).inc()
+        log.info(
+            "injection",
+            extra={
+                "event": {
+                    "session": task.fields.get("session"),
+                    "service": name,
+                    "target": task.ip,
+                    # Enough to match flags up without logging them
+                    "flag_hash": hashlib.sha256(task.flag.encode()).hexdigest()[:16],
+                    "outcome": outcome,
+                    "error_class": error_class,
+                    "error": message,
+                    "elapsed": round(task.elapsed * 1000, 1),
+                    "timings": timings(task),
+                }
+            },
+        )
+        # Neither reached the target, so say nothing about its health
+        if outcome in ("circuit_open", "rejected"):
+            return
+
+        metrics.INJECTION_DURATION.labels(name, task.ip).observe(task.elapsed)
+
+        # Only network errors count against a target. A wrong answer, or a
+        # reply the checker choked on (an HTTP error, a missing field),
+        # means the service is up.
+        if unreachable:
+            if self.breaker.failure(task.ip):
+                metrics.OPEN_CIRCUITS.labels(name).inc()
+        elif self.breaker.success(task.ip):
+            metrics.OPEN_CIRCUITS.labels(name).dec()
+
+    def warm(self, ips):
+        """
+        Opens keep-alive connections to each target ahead of a round.
+        Checkers that don't speak HTTP have nothing to warm, and targets
+        that close their connections are skipped.
+        """
+        if not self.checker.http:
+            return []
+
+        port = self.checker.port
+        futures = [
+            (ip, self.executor.submit(self.pools.warm, f"http://{ip}:{port}"))
+            for ip in ips
+        ]
+
+        results = []
+        for ip, future in futures:
+            result = future.result()
+            if result == "SUCCESS":
+                results.append({"ip": ip, "status": "success"})
+            elif result == "SKIPPED":
+                results.append({"ip": ip, "status": "skipped"})
+            else:
+                results.append({"ip": ip, "status": "failure", "message": result})
+        return results
+
+    def run_healthchecks(self):
+        """
+        Starts a healthcheck against every known target, skipping targets
+        that are down or whose previous check is still running, and
+        schedules the next run.
+        """
+        with self.health_lock:
+            targets = [
+                fields
+                for ip, fields in self.targets.items()
+                if ip not in self.health_running and not self.breaker.is_open(ip)
+            ]
+            self.health_running.update(fields["ip"] for fields in targets)
+
+        for fields in targets:
+            self.executor.submit(self.healthcheck, Task(self, fields))
+
+        self.scheduler.call_later(
+            self.checker.healthcheck_interval, self.run_healthchecks
+        )
+
+    def healthcheck(self, task):
+        """
+        Runs the checker's healthcheck hook against one target and stores
+        the verdict for /health.
+        """
+        try:
+            self.attempt("healthcheck", task)
+            outcome, result = "success", {"status": "success"}
+        except RetryLater as retry:
+            self.scheduler.call_later(retry.delay, self.healthcheck, task)
+            return
+        except Exception as e:
+            outcome, message = self.describe(task, e)
+            result = {"status": "failure", "message": message}
+
+        metrics.HEALTHCHECKS.labels(self.checker.name, task.ip, outcome).inc()
+
+        with self.health_lock:
+            self.health[task.ip] = {**result, "checked": time()}
+            self.health_running.discard(task.ip)
+
+    def health_results(self):
+        """
+        Returns the latest healthcheck verdict for every checked target.
+        """
+        with self.health_lock:
+            return [{"ip": ip, **result} for ip, result in self.health.items()]
+
+    def schedule_round(self, targets, window=ROUND_WINDOW, listener=None):
+        """
+        Spreads a round's injections evenly over window seconds. Each target
+        gets its own slot, in random order, and a random offset within it,
+        so load stays flat but the timing is unpredictable. Returns a payload
+        per target with the job tracking its injection. listener, if given,
+        is called with each target's index and verdict once it is known.
+        """
+        slots = list(range(len(targets)))
+        random.shuffle(slots)
+        width = window / max(len(targets), 1)
+
+        results = []
+        for target, slot in zip(targets, slots):
+            if self.missing_fields(target):
+                results.append(
+                    {"status": "error", "message": "Missing required parameters"}
+                )
+                continue
+
+            delay = (slot + random.random()) * width
+            # Results hold a payload per target so far, so this is its index
+            notify = partial(listener, len(results)) if listener else None
+            job_id = self.create_job(target, status="scheduled", listener=notify)
+            metrics.SCHEDULED_INJECTIONS.labels(self.checker.name).inc()
+            self.scheduler.call_later(delay, self.run_scheduled, job_id, target)
+
+            results.append(
+                {"ip": target["ip"], "status": "scheduled", "job_id": job_id}
+            )
+        return results
+
+    def run_scheduled(self, job_id, fields):
+        """
+        Runs an injection from a scheduled round once its slot comes up.
+        """
+        metrics.SCHEDULED_INJECTIONS.labels(self.checker.name).dec()
+        with self.jobs_lock:
+            self.jobs[job_id]["status"] = "pending"
+
+        self.submit(fields, job_id).add_done_callback(partial(self.crashed, job_id))
+
+    def crashed(self, job_id, future):
+        """
+        Fails a job whose injection blew up before reaching complete_job.
+        """
+        e = future.exception()
+        if e is not None:
+            self.complete_job(job_id, {"status": "error", "message": f"Error: {e}"})
+
+    def create_job(self, fields, status="pending", listener=None):
+        """
+        Records an injection whose verdict will be known later. listener, if
+        given, is called with the verdict once it is.
+        """
+        self.prune_jobs()
+
+        job_id = uuid.uuid4().hex
+        with self.jobs_lock:
+            self.jobs[job_id] = {
+                "callback": fields.get("callback"),
+                "status": status,
+                "finished": None,
+                "listeners": [listener] if listener else [],
+            }
+        return job_id
+
+    def follow_job(self, job_id, listener):
+        """
+        Calls listener with a job's verdict once it is known, or straight
+        away if it already is.
+        """
+        with self.jobs_lock:
+            job = self.jobs[job_id]
+            if job["finished"] is None:
+                job["listeners"].append(listener)
+                return
+            result = job["result"]
+        listener(result)
+
+    def defer_verify(self, job_id, task, state):
+        """
+        Schedules a job's verification after the checker's verify_delay.
+        Called from the put's lane, and holds the verify's place right
+        behind it so the target's next put can't overtake it.
+        """
+        with self.jobs_lock:
+            self.jobs[job_id].update(task=task, state=state, status="pending")
+        metrics.PENDING_VERIFICATIONS.labels(self.checker.name).inc()
+
+        slot = self.lanes.reserve(task.ip, front=True)
+        self.scheduler.call_later(
+            random.uniform(*self.checker.verify_delay),
+            slot.fill,
+            self.finish_job,
+            job_id,
+        )
+
+    def finish_job(self, job_id):
+        """
+        Verifies a deferred job and stores the verdict.
+        """
+        with self.jobs_lock:
+            job = self.jobs[job_id]
+        metrics.PENDING_VERIFICATIONS.labels(self.checker.name).dec()
+
+        self.verify(job["task"], job["state"], job_id)
+
+    def complete_job(self, job_id, result):
+        """
+        Stores a job's verdict and fires its callback, if one was given.
+        Returns the result, and does nothing if there is no job.
+        """
+        if job_id is None:
+            return result
+
+        with self.jobs_lock:
+            job = self.jobs[job_id]
+            job.update(result)
+            job["result"] = result
+            job["finished"] = time()
+            # Drop the task and checker state, they're no longer needed
+            job.pop("task", None)
+            job.pop("state", None)
+            listeners = job["listeners"]
+
+        for listener in listeners:
+            listener(result)
+
+        if job["callback"]:
+            try:
+                requests.post(
+                    job["callback"], json={"job_id": job_id, **result}, timeout=5
+                )
+            except requests.exceptions.RequestException as e:
+                log.warning(f"Callback for job {job_id} failed: {e}")
+
+        return result
+
+    def job(self, job_id):
+        """
+        Returns the payload for a job, or None if it is unknown.
+        """
+        with self.jobs_lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+
+            payload = {"job_id": job_id, "status": job["status"]}
+            if "message" in job:
+                payload["message"] = job["message"]
+            return payload
+
+    def prune_jobs(self):
+        """
+        Drops finished jobs older than JOB_TTL.
+        """
+        cutoff = time() - JOB_TTL
+        with self.jobs_lock:
+            for job_id in [
+                job_id
+                for job_id, job in self.jobs.items()
+                if job["finished"] and job["finished"] < cutoff
+            ]:
+                del self.jobs[job_id]
@@ -0,0 +1,38 @@
+# Delayed execution for the scoring bots.
+# A single timer thread hands due calls to a worker pool, so delays (such
+# as the anti-fingerprinting pause before a verify) never hold a worker.
+
+import heapq
+import itertools
+import threading
+from time import time
+
+
+class Scheduler:
+    """
+    Runs callables on an executor once their delay has elapsed.
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.queue = []
+        self.counter = itertools.count()
+        self.cv = threading.Condition()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def call_later(self, delay, fn, *args):
+        """
+        Schedules fn(*args) to run on the executor after delay seconds.
+        """
+        with self.cv:
+            heapq.heappush(self.queue, (time() + delay, next(self.counter), fn, args))
+            self.cv.notify()
+
+    def _loop(self):
+        while True:
+            with self.cv:
+                while not self.queue or self.queue[0][0] > time():
+                    timeout = self.queue[0][0] - time() if self.queue else None
+                    self.cv.wait(timeout)
+                _, _, fn, args = heapq.heappop(self.queue)
+            self.executor.submit(fn, *args)
@@ -0,0 +1,181 @@
+# Command line and production servers for the scoring bots.
+# Every bot is started through serve(), which takes --port, --bind,
+# --workers, --threads and --server from argv. gunicorn and uvicorn are
+# optional; "auto" picks the first one installed and falls back to
+# Flask's threaded development server.
+
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .app import create_app
+from .base import get_checker
+from .log import setup_logging
+from .runner import Runner
+
+SERVERS = ("auto", "gunicorn", "uvicorn", "werkzeug")
+
+# Environment used to hand the settings to uvicorn's spawned workers
+CHECKER_ENV = "CHECKER_NAME"
+THREADS_ENV = "CHECKER_THREADS"
+EVENT_LOG_ENV = "CHECKER_EVENT_LOG"
+
+
+def load_app(name, event_log=None):
+    """
+    Builds a bot's Flask app. Called once per worker process, so each
+    worker has its own Runner and log writer.
+    """
+    setup_logging(event_log)
+    return create_app(Runner(get_checker(name)))
+
+
+def installed(module):
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def pick_server(server):
+    if server != "auto":
+        return server
+    if installed("gunicorn"):
+        return "gunicorn"
+    if installed("uvicorn") and installed("asgiref"):
+        return "uvicorn"
+    return "werkzeug"
+
+
+def wsgi_to_asgi(app, threads):
+    """
+    Wraps a WSGI app for an asyncio server, running requests on a bounded
+    pool of threads. asgiref's own wrapper runs every request on a single
+    shared thread, which would serialise injections.
+    """
+    from asgiref.sync import sync_to_async
+    from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    # The plain function behind asgiref's sync_to_async decorator
+    run_wsgi_app = WsgiToAsgiInstance.__dict__["run_wsgi_app"].func
+
+    class Instance(WsgiToAsgiInstance):
+        async def run_wsgi_app(self, body):
+            run = partial(run_wsgi_app, self, body)
+            await sync_to_async(run, thread_sensitive=False, executor=executor)()
+
+    class Wrapper(WsgiToAsgi):
+        async def __call__(self, scope, receive, send):
+            await Instance(self.wsgi_application, self.duplicate_header_limit)(
+                scope, receive, send
+            )
+
+    return Wrapper(app)
+
+
+def asgi_app():
+    """
+    App factory for uvicorn's worker processes.
+    """
+    app = load_app(os.environ[CHECKER_ENV], os.environ.get(EVENT_LOG_ENV))
+    return wsgi_to_asgi(app, int(os.environ[THREADS_ENV]))
+
+
+def run_gunicorn(name, args):
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.bind}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("worker_class", "gthread")
+            # Batches and rounds can legitimately keep a request open a while
+            self.cfg.set("timeout", 0)
+
+        def load(self):
+            return load_app(name, args.event_log)
+
+    Application().run()
+
+
+def run_uvicorn(name, args):
+    import uvicorn
+
+    if args.workers == 1:
+        uvicorn.run(
+            wsgi_to_asgi(load_app(name, args.event_log), args.threads),
+            host=args.bind,
+            port=args.port,
+        )
+        return
+
+    os.environ[CHECKER_ENV] = name
+    os.environ[THREADS_ENV] = str(args.threads)
+    if args.event_log:
+        os.environ[EVENT_LOG_ENV] = args.event_log
+    uvicorn.run(
+        f"{__name__}:asgi_app",
+        factory=True,
+        host=args.bind,
+        port=args.port,
+        workers=args.workers,
+    )
+
+
+def run_werkzeug(name, args):
+    if args.workers != 1:
+        raise SystemExit("The werkzeug server only supports --workers 1")
+    load_app(name, args.event_log).run(host=args.bind, port=args.port, threaded=True)
+
+
+def parse_args(name, port, argv=None):
+    parser = argparse.ArgumentParser(description=f"Scoring bot for {name}")
+    parser.add_argument("--port", type=int, default=port)
+    parser.add_argument("--bind", default="0.0.0.0", help="address to listen on")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="worker processes, each with its own jobs, caches and breakers",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=32,
+        help="requests handled concurrently per worker",
+    )
+    parser.add_argument(
+        "--server",
+        choices=SERVERS,
+        default="auto",
+        help="gunicorn (multi-worker WSGI), uvicorn (asyncio) or werkzeug",
+    )
+    parser.add_argument(
+        "--event-log",
+        metavar="PATH",
+        help="rotating JSON lines log of every injection; with several "
+        "workers, include {pid} in the path",
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1:
+        parser.error("--workers and --threads must be at least 1")
+    if args.workers > 1 and args.event_log and "{pid}" not in args.event_log:
+        parser.error("--event-log needs {pid} in the path with several workers")
+    return args
+
+
+def serve(name, port):
+    """
+    Serves the checker registered under name, configured from argv.
+    """
+    args = parse_args(name, port)
+    runners = {
+        "gunicorn": run_gunicorn,
+        "uvicorn": run_uvicorn,
+        "werkzeug": run_werkzeug,
+    }
+    runners[pick_server(args.server)](name, args)
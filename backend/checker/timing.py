@@ -0,0 +1,82 @@
+# Network timings for the scoring bots' phases.
+# While a task is in a phase it is bound to the worker thread, and the
+# connections it makes report their TCP connect, TLS handshake and time to
+# first byte against that phase. Telling these apart from the phase total
+# shows whether a slow round was the network, the team's service or the bot.
+
+import threading
+from time import perf_counter
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+_current = threading.local()
+
+
+def bind(timings):
+    """
+    Directs this thread's network timings into the given dict, or nowhere
+    if timings is None. Returns the previously bound dict.
+    """
+    previous = getattr(_current, "timings", None)
+    _current.timings = timings
+    return previous
+
+
+def record(kind, seconds):
+    """
+    Adds seconds to the bound phase's total for kind ("connect", "tls" or
+    "first_byte").
+    """
+    timings = getattr(_current, "timings", None)
+    if timings is not None:
+        timings[kind] = timings.get(kind, 0) + seconds
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def _new_conn(self):
+        start = perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            self.tcp_time = perf_counter() - start
+            record("connect", self.tcp_time)
+
+    def getresponse(self, *args, **kwargs):
+        # The request has been sent, so this waits for the status line
+        start = perf_counter()
+        try:
+            return super().getresponse(*args, **kwargs)
+        finally:
+            record("first_byte", perf_counter() - start)
+
+
+class TimedHTTPSConnection(TimedHTTPConnection, HTTPSConnection):
+    def connect(self):
+        self.tcp_time = 0
+        start = perf_counter()
+        try:
+            super().connect()
+        finally:
+            record("tls", perf_counter() - start - self.tcp_time)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    An HTTPAdapter whose connections report their timings.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
@@ -1,71 +1,58 @@
 # This is a flag injection script for the CyberNote challenge.
-# It now runs as a Flask web server to handle API requests.
+# The HTTP API, concurrency, timeouts and retries come from the shared
+# checker package, this file only describes the exchange with the app.
 
-import requests
 import hashlib
-from flask import Flask, request, jsonify
+from checker import Checker, CheckFailed, register
+from checker.body import search
+from checker.server import serve
 
-app = Flask(__name__)
 
-PORT = 5000
-
-
-def inject_flag(ip, flag):
+@register
+class CybernoteChecker(Checker):
     """
-    This function contains the original flag injection logic.
-    It takes ip, port, and flag as arguments and returns the result.
+    Signs up as admin with a password derived from the flag, stores the
+    flag as the note and reads it back from the home page.
     """
-    base_url = f"http://{ip}:{PORT}"
-    flagHash = hashlib.md5(flag.encode()).hexdigest()[:10]
-    credentials = {"user": "admin", "passwd": flagHash}
-
-    with requests.Session() as s:
-        try:
-            # Sign up
-            signupResp = s.post(f"{base_url}/signup", data=credentials, timeout=5)
-            signupResp.raise_for_status()
-
-            # Post the note
-            noteResp = s.post(f"{base_url}/note", data={"note": flag}, timeout=5)
-            noteResp.raise_for_status()
 
-            # Verify note
-            homeResp = s.get(f"{base_url}/home", timeout=5)
-            homeResp.raise_for_status()
+    name = "cybernote"
+    port = 5000
 
-            if flag in homeResp.text:
-                return "SUCCESS"
-            else:
-                return "FAILURE"
+    def put(self, task):
+        flagHash = hashlib.md5(task.flag.encode()).hexdigest()[:10]
+        credentials = {"user": "admin", "passwd": flagHash}
 
-        except requests.exceptions.RequestException as e:
-            return f"Error: {e}"
+        # Connections come from the target's keep-alive pool, cookies don't
+        s = task.session()
 
+        # Sign up
+        with task.phase("signup"):
+            signupResp = s.post(
+                f"{task.base_url}/signup", data=credentials, timeout=task.timeout
+            )
+            signupResp.raise_for_status()
 
-@app.route("/inject", methods=["POST"])
-def inject():
-    """
-    This is the API endpoint. It expects a POST request with a JSON body
-    containing 'ip' and 'flag'.
-    """
-    data = request.get_json()
-    if not data or "ip" not in data or "flag" not in data:
-        return (
-            jsonify({"status": "error", "message": "Missing required parameters"}),
-            400,
-        )
+        # Post the note
+        with task.phase("note"):
+            noteResp = s.post(
+                f"{task.base_url}/note", data={"note": task.flag}, timeout=task.timeout
+            )
+            noteResp.raise_for_status()
 
-    ip = data["ip"]
-    flag = data["flag"]
+        return s
 
-    result = inject_flag(ip, flag)
+    def verify(self, task, s):
+        # Verify note, reading the page only until the flag turns up
+        with task.phase("home"):
+            homeResp = s.get(
+                f"{task.base_url}/home", timeout=task.timeout, stream=True
+            )
+            homeResp.raise_for_status()
+            found = search(homeResp, task.flag, timeout=task.timeout)
 
-    if result == "SUCCESS":
-        return jsonify({"status": "success"})
-    else:
-        return jsonify({"status": "failure", "message": result})
+        if not found:
+            raise CheckFailed("Flag not found in note.")
 
 
 if __name__ == "__main__":
-    # This will run the Flask development server.
-    app.run(host="0.0.0.0", port=8080)
+    serve("cybernote", port=8080)
@@ -1,24 +1,166 @@
 from flask import (
     Flask,
+    g,
     redirect,
-    render_template_string,
     request,
     url_for,
     make_response,
 )
-import sqlite3
+from collections import OrderedDict
+import codecs
+import db
+import pages
+import serving
 import os
+import threading
 
 app = Flask(__name__)
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(script_dir, "database.db")
 
+# Usernames remembered as existing, so the cookie check can skip the
+# database. 0 turns the cache off.
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 1024))
+
+knownUsers = OrderedDict()
+knownUsersLock = threading.Lock()
+
+# Revisions per page of a user's note history
+NOTES_PAGE_SIZE = int(os.environ.get("NOTES_PAGE_SIZE", 20))
+MAX_NOTE_ID = 2**63 - 1
+
+# Pages are compiled, and the static ones rendered, once at startup
+site = pages.Pages(app)
+
+site.static_page(
+    "main",
+    """
+        <h2> Welcome to cybernote. login to view your note </h2>
+        <a href="/login"><button type=button> Login </button></a>
+        <a href="/signup"><button type=button> Signup </button></a>
+    """,
+)
+site.static_page(
+    "login",
+    """
+        <h1>Login</h1>
+
+        <form action="/home" method="post"> 
+            <label>User: <label>
+            <input type=text name="user"><br>
+            <label>Password: </lable>
+            <input type=text name=passwd><br>
+            <input type="submit" name="login" value="Login"> 
+            <a href="/">back</a>
+        </form>
+    """,
+)
+site.static_page(
+    "signup",
+    """
+        <h1>Signup</h1>
+        <form action="/signup" method="post"> 
+            <label>User: <label>
+            <input type=text name="user"><br>
+            <label>Password: </lable>
+            <input type=text name=passwd><br>
+            <input type="submit" name="signup" value="Signup"> 
+            <a href="/">back</a>
+        </form>
+    """,
+    raw=True,
+)
+# The username and note go in unescaped, as they always have. The note
+# is any iterable of text, so large ones can be streamed.
+site.template(
+    "home",
+    """
+            <div style="display:flex; flex-direction: column; margin: 5rem;">
+
+                <div style="padding: 15px;display:flex; flex-direction: row; align-items: center"> 
+                    <div style="margin-right: 20px;">
+                        <h1> {{ username|safe }}'s note </h1>
+                    </div>
+                    <a href="/logout"><input type="button" value="logout"></a>
+                    <a href="/notes"><input type="button" value="history"></a>
+                </div>
+                <div style="box-shadow: rgba(99, 99, 99, 0.2) 0px 2px 8px 0px; padding: 2rem;">
+                    <form action="/note" method="post" style="margin:0px;"> 
+                        <textarea id="message" name="note" rows="5" cols="40" placeholder="Write some notes">{% for chunk in note %}{{ chunk|safe }}{% endfor %}</textarea>
+
+                        <br><br>
+                    
+                        <input type="submit" name="save" value="Save"> 
+                    </form>
+                </div>
+            </div>
+        """,
+)
+site.template(
+    "notes",
+    """
+    <h1>{{ username }}'s notes</h1>
+    <ul>
+    {% for note in notes %}
+        <li><a href="/notes/{{ note['id'] }}">{{ note['created'] }}</a></li>
+    {% endfor %}
+    </ul>
+    {% if older %}<a href="/notes?before={{ older }}">older</a>{% endif %}
+    <a href="/home">back</a>
+    """,
+)
+
 
 def getDb():
-    db = sqlite3.connect(DB_PATH)
-    db.row_factory = sqlite3.Row
-    return db
+    return db.connect(DB_PATH)
+
+
+def isKnownUser(username):
+    with knownUsersLock:
+        if username in knownUsers:
+            knownUsers.move_to_end(username)
+            return True
+    return False
+
+
+def rememberUser(username):
+    if not USER_CACHE_SIZE:
+        return
+    with knownUsersLock:
+        knownUsers[username] = True
+        knownUsers.move_to_end(username)
+        if len(knownUsers) > USER_CACHE_SIZE:
+            knownUsers.popitem(last=False)
+
+
+def getUser():
+    """
+    Returns the cookie's user row (id, note_id of their latest note, if
+    any), or None. The database is only asked once per request, however
+    many times this is called.
+    """
+    if "user" not in g:
+        username = request.cookies.get("username")
+        g.user = None
+
+        if username:
+            sql = """
+                SELECT id, (
+                    SELECT notes.id FROM notes WHERE notes.owner = users.id
+                    ORDER BY notes.id DESC LIMIT 1
+                ) AS note_id
+                FROM users WHERE id = ?
+            """
+            con = getDb()
+            cur = con.cursor()
+            g.user = cur.execute(sql, [username]).fetchone()
+            con.close()
+
+        if g.user is not None:
+            rememberUser(username)
+
+    return g.user
 
 
 def checkUserCookie():
@@ -27,13 +169,25 @@ def checkUserCookie():
     if not username:
         return False
 
-    sql = "SELECT id FROM users WHERE id = ?"
-    con = getDb()
-    cur = con.cursor()
-    result = cur.execute(sql, [username]).fetchone()
-    con.close()
+    if isKnownUser(username):
+        return True
 
-    return result is not None
+    return getUser() is not None
+
+
+
+def noteChunks(noteId):
+    """
+    Yields the text of a note a chunk at a time, or nothing if noteId is
+    None.
+    """
+    if noteId is None:
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in db.stream(DB_PATH, "notes", "body", noteId):
+        yield decoder.decode(chunk)
+    yield decoder.decode(b"", final=True)
 
 
 @app.route("/")
@@ -41,31 +195,12 @@ def main():
     if checkUserCookie():
         return redirect(url_for("home"))
 
-    return render_template_string(
-        """
-        <h2> Welcome to cybernote. login to view your note </h2>
-        <a href="/login"><button type=button> Login </button></a>
-        <a href="/signup"><button type=button> Signup </button></a>
-    """
-    )
+    return site.serve("main")
 
 
 @app.route("/login")
 def loginPage():
-    return render_template_string(
-        """
-        <h1>Login</h1>
-
-        <form action="/home" method="post"> 
-            <label>User: <label>
-            <input type=text name="user"><br>
-            <label>Password: </lable>
-            <input type=text name=passwd><br>
-            <input type="submit" name="login" value="Login"> 
-            <a href="/">back</a>
-        </form>
-    """
-    )
+    return site.serve("login")
 
 
 @app.route("/signup", methods=["POST", "GET"])
@@ -77,7 +212,7 @@ def signupPage():
         sql = "SELECT id FROM users WHERE id = ?"
         con = getDb()
         cur = con.cursor()
-        existing_user = cur.execute(sql, [user]).fetchone()
+        existing_user = isKnownUser(user) or cur.execute(sql, [user]).fetchone()
 
         if existing_user:
             con.close()
@@ -99,55 +234,27 @@ def signupPage():
         cur.execute(sql, [user, passwd, ""])
         con.commit()
         con.close()
+        rememberUser(user)
 
         response = make_response(redirect(url_for("home")))
         response.set_cookie("username", user)
         response.set_cookie("password", passwd)
 
         return response
-    return """
-        <h1>Signup</h1>
-        <form action="/signup" method="post"> 
-            <label>User: <label>
-            <input type=text name="user"><br>
-            <label>Password: </lable>
-            <input type=text name=passwd><br>
-            <input type="submit" name="signup" value="Signup"> 
-            <a href="/">back</a>
-        </form>
-    """
+    return site.serve("signup")
 
 
 @app.route("/home", methods=["POST", "GET"])
 def home():
-
-    def home_page(username):
-        return f"""
-            <div style="display:flex; flex-direction: column; margin: 5rem;">
-
-                <div style="padding: 15px;display:flex; flex-direction: row; align-items: center"> 
-                    <div style="margin-right: 20px;">
-                        <h1> {username}'s note </h1>
-                    </div>
-                    <a href="/logout"><input type="button" value="logout"></a>
-                </div>
-                <div style="box-shadow: rgba(99, 99, 99, 0.2) 0px 2px 8px 0px; padding: 2rem;">
-                    <form action="/note" method="post" style="margin:0px;"> 
-                        <textarea id="message" name="note" rows="5" cols="40" placeholder="Write some notes">{note}</textarea>
-
-                        <br><br>
-                    
-                        <input type="submit" name="save" value="Save"> 
-                    </form>
-                </div>
-            </div>
-        """
-
     if request.method == "POST":
         username = request.form.get("user")
         passwd = request.form.get("passwd")
 
-        sql = "SELECT note FROM users WHERE id = '%s' AND passwd = '%s'" % (
+        sql = (
+            "SELECT (SELECT body FROM notes WHERE owner = users.id"
+            " ORDER BY id DESC LIMIT 1) AS note"
+            " FROM users WHERE id = '%s' AND passwd = '%s'"
+        ) % (
             username,
             passwd,
         )
@@ -165,8 +272,9 @@ def home():
 
         note = result["note"]
 
-        page = home_page(username)
-        response = make_response(page)
+        response = site.stream(
+            "home", username=username, note=["" if note is None else note]
+        )
         response.set_cookie("username", username)
         response.set_cookie("password", passwd)
         return response
@@ -176,16 +284,10 @@ def home():
 
         username = request.cookies.get("username")
 
-        sql = "SELECT note FROM users WHERE id = ?"
-        con = getDb()
-        cur = con.cursor()
-        result = cur.execute(sql, [username]).fetchone()
-        con.close()
-        note = result["note"] if result is not None else ""
+        result = getUser()
+        noteId = result["note_id"] if result is not None else None
 
-        page = home_page(username)
-        response = make_response(page)
-        return response
+        return site.stream("home", username=username, note=noteChunks(noteId))
 
 
 @app.route("/logout")
@@ -204,16 +306,62 @@ def insertNote():
     username = request.cookies.get("username")
     note_content = request.form.get("note")
 
-    sql = "UPDATE users SET note = ? WHERE id = ?"
+    # Revisions are only ever added, the latest one is the current note
+    sql = "INSERT INTO notes (owner, body) VALUES (?, ?)"
     con = getDb()
     cur = con.cursor()
-    cur.execute(sql, [note_content, username])
+    cur.execute(sql, [username, note_content or ""])
     con.commit()
     con.close()
 
     return redirect(url_for("home"))
 
 
+@app.route("/notes")
+def listNotes():
+    if not checkUserCookie():
+        return redirect("/")
+
+    username = request.cookies.get("username")
+    before = request.args.get("before", type=int) or MAX_NOTE_ID
+
+    # Newest first, paged on the id so each page is a short index scan
+    sql = """
+        SELECT id, created FROM notes
+        WHERE owner = ? AND id < ?
+        ORDER BY id DESC LIMIT ?
+    """
+    con = getDb()
+    cur = con.cursor()
+    notes = cur.execute(sql, [username, before, NOTES_PAGE_SIZE + 1]).fetchall()
+    con.close()
+
+    older = notes[NOTES_PAGE_SIZE - 1]["id"] if len(notes) > NOTES_PAGE_SIZE else None
+    return site.render(
+        "notes", username=username, notes=notes[:NOTES_PAGE_SIZE], older=older
+    )
+
+
+@app.route("/notes/<int:noteId>")
+def showNote(noteId):
+    if not checkUserCookie():
+        return redirect("/")
+
+    sql = "SELECT id FROM notes WHERE id = ? AND owner = ?"
+    con = getDb()
+    cur = con.cursor()
+    note = cur.execute(sql, [noteId, request.cookies.get("username")]).fetchone()
+    con.close()
+
+    if note is None:
+        return "Note not found.", 404
+
+    return app.response_class(
+        db.stream(DB_PATH, "notes", "body", noteId),
+        mimetype="text/plain",
+    )
+
+
 if __name__ == "__main__":
     con = getDb()
     con.execute(
@@ -225,5 +373,26 @@ if __name__ == "__main__":
             )
                 """
     )
+    # Notes live in their own table, one row per saved revision
+    con.executescript(
+        """
+            CREATE TABLE IF NOT EXISTS notes (
+                id INTEGER PRIMARY KEY,
+                owner TEXT NOT NULL,
+                body TEXT NOT NULL,
+                created TEXT DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS notes_owner ON notes (owner, id);
+            CREATE TRIGGER IF NOT EXISTS notes_no_update BEFORE UPDATE ON notes
+            BEGIN SELECT RAISE(ABORT, 'notes are append-only'); END;
+            CREATE TRIGGER IF NOT EXISTS notes_no_delete BEFORE DELETE ON notes
+            BEGIN SELECT RAISE(ABORT, 'notes are append-only'); END;
+
+            -- Notes saved before the table existed
+            INSERT INTO notes (owner, body)
+            SELECT id, note FROM users
+            WHERE note != '' AND id NOT IN (SELECT owner FROM notes);
+        """
+    )
     con.close()
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
+    serving.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
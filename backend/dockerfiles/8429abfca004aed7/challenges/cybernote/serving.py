@@ -0,0 +1,70 @@
+# Serving modes for Cybernote.
+# By default the app runs on Flask's threaded server, which ties up a thread
+# for every open connection. With CYBERNOTE_SERVER=asgi the same app runs
+# under uvicorn instead: the event loop holds the connections, so thousands
+# of idle or slow ones cost next to nothing, and requests run on a bounded
+# pool of ASGI_THREADS threads so SQLite calls never block the loop.
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# "werkzeug" (Flask's threaded server) or "asgi" (uvicorn)
+SERVER = os.environ.get("CYBERNOTE_SERVER", "werkzeug")
+
+# Requests handled at once in asgi mode, the rest wait their turn
+ASGI_THREADS = int(os.environ.get("ASGI_THREADS", 16))
+
+# Connections and requests held at once in asgi mode before new ones get
+# a 503
+ASGI_MAX_CONNECTIONS = int(os.environ.get("ASGI_MAX_CONNECTIONS", 4096))
+
+
+def wsgi_to_asgi(app, threads):
+    """
+    Wraps a WSGI app for an asyncio server, running requests on a bounded
+    pool of threads. asgiref's own wrapper runs every request on a single
+    shared thread, which would serialise them.
+    """
+    from asgiref.sync import sync_to_async
+    from asgiref.wsgi import WsgiToAsgiInstance
+
+    executor = ThreadPoolExecutor(max_workers=threads)
+    # The plain function behind asgiref's sync_to_async decorator
+    run_wsgi_app = WsgiToAsgiInstance.__dict__["run_wsgi_app"].func
+
+    class Instance(WsgiToAsgiInstance):
+        async def run_wsgi_app(self, body):
+            run = partial(run_wsgi_app, self, body)
+            await sync_to_async(run, thread_sensitive=False, executor=executor)()
+
+    async def application(scope, receive, send):
+        await Instance(app)(scope, receive, send)
+
+    return application
+
+
+def run(app, host, port):
+    """
+    Serves app in the mode picked by CYBERNOTE_SERVER, falling back to
+    Flask's server if uvicorn or asgiref isn't installed.
+    """
+    if SERVER == "asgi":
+        try:
+            import uvicorn
+            import asgiref  # noqa: F401
+        except ImportError as e:
+            print(f"asgi mode unavailable ({e}), using Flask", file=sys.stderr)
+        else:
+            uvicorn.run(
+                wsgi_to_asgi(app, ASGI_THREADS),
+                host=host,
+                port=port,
+                lifespan="off",
+                limit_concurrency=ASGI_MAX_CONNECTIONS,
+                backlog=ASGI_MAX_CONNECTIONS,
+            )
+            return
+
+    app.run(host=host, port=port)
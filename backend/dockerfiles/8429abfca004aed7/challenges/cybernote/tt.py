@@ -5,26 +5,110 @@
 # 
 # note taking app
 
-from flask import Flask, make_response, redirect, render_template_string, request, template_rendered, url_for
+from flask import Flask, make_response, redirect, request, template_rendered, url_for
 import sqlite3
+import db
+import pages
+import serving
 import os
 
 app = Flask(__name__)
 
 DB_PATH = "./database.db"
 
-def get_db():
-    db = sqlite3.connect(DB_PATH)
-    db.row_factory = sqlite3.Row
-    return db
+# Pages are compiled, and the static ones rendered, once at startup
+site = pages.Pages(app)
 
-@app.route("/")
-def main():
-    return render_template_string("""
+site.static_page(
+    "main",
+    """
         <h2> Welcome to cybernote. login to view your note </h2>
         <a href="/login"><button type=button> Login </button></a>
         <a href="/signup"><button type=button> Signup </button></a>
-    """)
+    """,
+)
+site.template(
+    "login_failed",
+    """
+            <h1>Login</h1>
+            <p style="color:red;">Invalid credentials</p>
+            <form action="/login" method="post"> 
+                <label>User: </label>
+                <input type=text name="user"><br>
+                <label>Password: </label>
+                <input type=text name=passwd><br>
+                <input type="submit" value="Login"> 
+            </form>
+            """,
+)
+site.static_page(
+    "login",
+    """
+        <h1>Login</h1>
+        <form action="/login" method="post"> 
+            <label>User: </label>
+            <input type=text name="user"><br>
+            <label>Password: </label>
+            <input type=text name=passwd><br>
+            <input type="submit" value="Login"> 
+        </form>
+        """,
+)
+site.template(
+    "signup_exists",
+    """
+                <h1>Signup</h1>
+                <p style=\"color:red;\">User already exists</p>
+                <form action="/signup" method="post"> 
+                    <label>User: </label>
+                    <input type=text name="user"><br>
+                    <label>Password: </label>
+                    <input type=text name=passwd><br>
+                    <input type="submit" value="Signup"> 
+                </form>
+                """,
+)
+site.static_page(
+    "signup",
+    """
+        <h1>Signup</h1>
+        <form action="/signup" method="post"> 
+            <label>User: </label>
+            <input type=text name="user"><br>
+            <label>Password: </label>
+            <input type=text name=passwd><br>
+            <input type="submit" value="Signup"> 
+        </form>
+        """,
+)
+site.template(
+    "note",
+    """
+                <h1>Note for {{ user }}</h1>
+                <pre>{{ note }}</pre>
+                """,
+)
+site.template(
+    "access_denied",
+    """
+            <h1>Access denied</h1>
+            <a href="/login">Back to Login</a>
+        """,
+)
+site.template(
+    "no_note",
+    """
+            <h1>No note found for {{ user }}</h1>
+            <a href="/login">Login</a>
+            """,
+)
+
+def get_db():
+    return db.connect(DB_PATH)
+
+@app.route("/")
+def main():
+    return site.serve("main")
 
 @app.route("/login", methods=["GET", "POST"])  
 def loginPage():
@@ -39,36 +123,13 @@ def loginPage():
         con.close()
         if row:
             return redirect(url_for("homePage", username=user))
-        login_page = render_template_string(
-            """
-            <h1>Login</h1>
-            <p style="color:red;">Invalid credentials</p>
-            <form action="/login" method="post"> 
-                <label>User: </label>
-                <input type=text name="user"><br>
-                <label>Password: </label>
-                <input type=text name=passwd><br>
-                <input type="submit" value="Login"> 
-            </form>
-            """
-        )
+        login_page = site.render("login_failed")
 
         response = make_response(login_page)
         response.set_cookie("username", user)
         response.set_cookie("passwd", passwd)
         return response
-    return render_template_string(
-        """
-        <h1>Login</h1>
-        <form action="/login" method="post"> 
-            <label>User: </label>
-            <input type=text name="user"><br>
-            <label>Password: </label>
-            <input type=text name=passwd><br>
-            <input type="submit" value="Login"> 
-        </form>
-        """
-    )
+    return site.serve("login")
 
 @app.route("/signup", methods=["GET", "POST"])  
 def signupPage():
@@ -82,19 +143,7 @@ def signupPage():
         exists = cur.execute(check_sql).fetchone()
         if exists:
             con.close()
-            return render_template_string(
-                """
-                <h1>Signup</h1>
-                <p style=\"color:red;\">User already exists</p>
-                <form action="/signup" method="post"> 
-                    <label>User: </label>
-                    <input type=text name="user"><br>
-                    <label>Password: </label>
-                    <input type=text name=passwd><br>
-                    <input type="submit" value="Signup"> 
-                </form>
-                """
-            )
+            return site.render("signup_exists")
         # insert new user with empty note (intentionally vulnerable formatting)
         insert_sql = "INSERT INTO users (id, passwd, note) VALUES ('%s', '%s', '%s')" % (user, passwd, "")
         cur.execute(insert_sql)
@@ -102,18 +151,7 @@ def signupPage():
         con.close()
         return redirect(url_for("loginPage"))
 
-    return render_template_string(
-        """
-        <h1>Signup</h1>
-        <form action="/signup" method="post"> 
-            <label>User: </label>
-            <input type=text name="user"><br>
-            <label>Password: </label>
-            <input type=text name=passwd><br>
-            <input type="submit" value="Signup"> 
-        </form>
-        """
-    )
+    return site.serve("signup")
 
 @app.route("/home", methods=["POST"])  
 def home():
@@ -142,18 +180,12 @@ def homePage(username):
         con.close()
 
         if note:
-            return render_template_string(
-                """
-                <h1>Note for {{ user }}</h1>
-                <pre>{{ note }}</pre>
-                """,
+            return site.render(
+                "note",
                 user=username,
                 note=note["note"] if isinstance(note, sqlite3.Row) else note,
             )
-        return render_template_string("""
-            <h1>Access denied</h1>
-            <a href="/login">Back to Login</a>
-        """)
+        return site.render("access_denied")
     else:
         # show note without extra checks (for the challenge)
         sql = "SELECT note FROM users WHERE id = '%s'" % (username)
@@ -162,21 +194,12 @@ def homePage(username):
         note = cur.execute(sql).fetchone()
         con.close()
         if note:
-            return render_template_string(
-                """
-                <h1>Note for {{ user }}</h1>
-                <pre>{{ note }}</pre>
-                """,
+            return site.render(
+                "note",
                 user=username,
                 note=note["note"] if isinstance(note, sqlite3.Row) else note,
             )
-        return render_template_string(
-            """
-            <h1>No note found for {{ user }}</h1>
-            <a href="/login">Login</a>
-            """,
-            user=username,
-        )
+        return site.render("no_note", user=username)
 
 if __name__ == "__main__":
     con = get_db()
@@ -190,6 +213,6 @@ if __name__ == "__main__":
                 """
     )
     con.close()
-    app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
+    serving.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
 
 
@@ -1,117 +1,77 @@
-import socket
-import re
-from time import sleep
-from random import randint
-from flask import Flask, request, jsonify
+# Scoring bot for the SkyMail service.
+# The HTTP API, deferred verification, timeouts and retries come from the
+# shared checker package, this file only speaks the SkyMail protocol.
 
+import os
+from checker import Checker, CheckFailed, register
+from checker.server import serve
+from skymail import PORT, SkyMailClient
 
-app = Flask(__name__)
+# Pipeline LOGIN and SEND in one write, saving a round-trip. Off by default
+# as the stock SkyMail server only handles one command per read().
+PIPELINE = os.environ.get("SKYMAIL_PIPELINE") == "1"
 
 
-def inject_flag(ip, flag, password):
+@register
+class SkyMailChecker(Checker):
     """
     Connects to a raw TCP service to inject and then verify a flag.
-    Flow: Connect -> Consume Banner -> Login -> Send -> Disconnect...
+    Flow: Connect -> Consume Banner -> Login -> Send -> Disconnect, then
+    after a random delay: Connect -> Consume Banner -> Login -> Read.
+    Each connection's whole exchange must finish within the timeout.
     """
-    BUFFER_SIZE = 4096
-    SERVER_ADDR = (ip, 9999)
 
-    try:
-        note_id = None
+    name = "email"
+    port = PORT
+    http = False
+    required_fields = ("ip", "flag", "password")
 
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(5)
-            s.connect(SERVER_ADDR)
+    # Wait a random duration before reading back to prevent fingerprinting
+    verify_delay = (1, 10)
 
-            # Consume the Welcome Banner
-            banner = s.recv(BUFFER_SIZE).decode()
-            if "220" not in banner:
-                print(f"Warning: Unexpected banner: {banner}")
-
-            # Login
-            login_cmd = f"LOGIN admin {password}\n"
-            s.sendall(login_cmd.encode())
-
-            # Check Login Response
-            login_resp = s.recv(BUFFER_SIZE).decode()
-            if "200" not in login_resp:
-                return f"FAILURE: Login rejected. Got: {login_resp.strip()}"
-
-            # Send Flag
-            send_cmd = f"SEND admin {flag}\n"
-            s.sendall(send_cmd.encode())
-
-            # Receive Response and Extract ID
-            response = s.recv(BUFFER_SIZE).decode()
-            match = re.search(r"\(ID: (.*?)\)", response)
-            if match:
-                note_id = match.group(1)
-            else:
-                return f"FAILURE: Could not extract ID. Server said: {response.strip()}"
-
-        # Sleep for a random duration to prevent fingerprinting
-        sleep(randint(1, 10))
-
-        # Verify flag by reading the email back
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(5)
-            s.connect(SERVER_ADDR)
-
-            # Consume Banner again for the new connection
-            s.recv(BUFFER_SIZE)
+    def put(self, task):
+        timeout = task.timeout_for("connect", "banner", "login", "send")
+        with task.phase("connect"):
+            client = SkyMailClient.connect(task.ip, self.port, timeout)
 
-            # Login again
-            login_cmd = f"LOGIN admin {password}\n"
-            s.sendall(login_cmd.encode())
-
-            if "200" not in s.recv(BUFFER_SIZE).decode():
-                return "FAILURE: Login rejected during verification."
-
-            # Read and verify
-            read_cmd = f"READ {note_id}\n"
-            s.sendall(read_cmd.encode())
-            read_response = s.recv(BUFFER_SIZE).decode()
+        with client:
+            # Consume the Welcome Banner
+            with task.phase("banner"):
+                client.banner()
 
-            if flag in read_response:
-                return "SUCCESS"
-            else:
-                return f"FAILURE: Flag not found. Got: {read_response.strip()}"
+            if PIPELINE:
+                with task.phase("send"):
+                    return client.login_and_send(
+                        "admin", task.password, "admin", task.flag
+                    )
 
-    except socket.timeout:
-        return "Error: Connection timed out."
-    except ConnectionRefusedError:
-        return "Error: Connection refused. Check IP/Port."
-    except Exception as e:
-        return f"Error: {e}"
+            with task.phase("login"):
+                client.login("admin", task.password)
 
+            # Send Flag and keep the email's ID for verification
+            with task.phase("send"):
+                return client.send_mail("admin", task.flag)
 
-@app.route("/inject", methods=["POST"])
-def inject():
-    """
-    API endpoint. Expects JSON:
-    {"ip": "...", "flag": "...", "password": "..."}
-    """
-    data = request.get_json()
+    def verify(self, task, mail_id):
+        timeout = task.timeout_for("reconnect", "verify_banner", "verify_login", "read")
+        with task.phase("reconnect"):
+            client = SkyMailClient.connect(task.ip, self.port, timeout)
 
-    # Check for all required fields including 'password'
-    required_fields = ["ip", "flag", "password"]
-    if not data or not all(field in data for field in required_fields):
-        return (
-            jsonify({"status": "error", "message": "Missing required parameters"}),
-            400,
-        )
+        with client:
+            # Consume Banner again for the new connection
+            with task.phase("verify_banner"):
+                client.banner()
 
-    ip = data["ip"]
-    flag = data["flag"]
-    password = data["password"]
+            with task.phase("verify_login"):
+                client.login("admin", task.password)
 
-    result = inject_flag(ip, flag, password)
+            # Read and verify
+            with task.phase("read"):
+                content = client.read_mail(mail_id)
 
-    if result == "SUCCESS":
-        return jsonify({"status": "success"})
-    else:
-        return jsonify({"status": "failure", "message": result})
+        if task.flag not in content:
+            raise CheckFailed(f"Flag not found. Got: {content.strip()}")
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8081)
+    serve("email", port=8081)
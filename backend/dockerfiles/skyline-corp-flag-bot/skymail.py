@@ -0,0 +1,70 @@
+# Client for the SkyMail line protocol (tcp 9999).
+# Every reply is a single "<code> <text>" line, except a successful READ,
+# which is followed by the email and a "." line.
+
+import re
+from checker import CheckFailed
+from checker.lines import LineClient
+from checker.log import log
+
+PORT = 9999
+
+
+class SkyMailClient(LineClient):
+    """
+    A SkyMail connection. The whole exchange shares the deadline given to
+    connect(), so a slow or stalling server costs a bounded amount of time.
+    """
+
+    def reply(self):
+        """
+        Reads a reply line, returning (code, line).
+        """
+        line = self.readline()
+        return line[:3], line
+
+    def banner(self):
+        code, line = self.reply()
+        if code != "220":
+            log.warning(f"Unexpected banner: {line}")
+
+    def login(self, user, password):
+        self.send(f"LOGIN {user} {password}")
+        self.check_login(*self.reply())
+
+    def send_mail(self, to, body):
+        """
+        Sends an email and returns the ID the server stored it under.
+        """
+        self.send(f"SEND {to} {body}")
+        return self.check_sent(*self.reply())
+
+    def login_and_send(self, user, password, to, body):
+        """
+        Pipelines LOGIN and SEND in one write and then reads both replies,
+        saving a round-trip. The reference server handles one command per
+        read(), so only use this against servers that buffer their input.
+        """
+        self.send(f"LOGIN {user} {password}", f"SEND {to} {body}")
+        self.check_login(*self.reply())
+        return self.check_sent(*self.reply())
+
+    def read_mail(self, mail_id):
+        """
+        Returns the content of an email.
+        """
+        self.send(f"READ {mail_id}")
+        code, line = self.reply()
+        if code != "200":
+            raise CheckFailed(f"Flag not found. Got: {line}")
+        return "\n".join(self.read_until("."))
+
+    def check_login(self, code, line):
+        if code != "200":
+            raise CheckFailed(f"Login rejected. Got: {line}")
+
+    def check_sent(self, code, line):
+        match = re.search(r"\(ID: (.*?)\)", line)
+        if code != "200" or not match:
+            raise CheckFailed(f"Could not extract ID. Server said: {line}")
+        return match.group(1)
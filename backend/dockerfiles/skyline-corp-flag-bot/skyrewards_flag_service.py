@@ -1,129 +1,147 @@
-import requests
+# Scoring bot for the SkyRewards service.
+# The HTTP API, concurrency, timeouts and retries come from the shared
+# checker package, this file only describes the exchange with the app.
+
+import os
 import hashlib
-from flask import Flask, request, jsonify
+import threading
+from checker import Checker, CheckFailed, register
+from checker.body import search
+from checker.server import serve
 
-app = Flask(__name__)
+PORT = 5000
 
 
-def inject_flag(target_host, flag, password):
+@register
+class SkyRewardsChecker(Checker):
     """
-    sends a POST request to the SkyRewards admin endpoint
-    to update the flag.
+    Sends a POST request to the SkyRewards admin endpoint to update the flag.
     """
-    url = f"http://{target_host}:5000/admin/update_flag"
-    headers = {"X-API-KEY": password}
-    payload = {"flag": flag}
 
-    try:
-        # Send request
-        response = requests.post(url, data=payload, headers=headers, timeout=5)
+    name = "skyrewards"
+    port = PORT
+    required_fields = ("ip", "flag", "password")
+
+    # The SLA check runs on its own schedule, separately from injections
+    healthcheck_interval = int(os.environ.get("HEALTHCHECK_INTERVAL", 120))
+
+    def __init__(self):
+        # Logged-in session per target, reused by every healthcheck
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+
+    def put(self, task):
+        headers = {"X-API-KEY": task.password}
+        payload = {"flag": task.flag}
+
+        # Send request over the target's keep-alive pool
+        with task.phase("update_flag"):
+            response = task.session().post(
+                f"{task.base_url}/admin/update_flag",
+                data=payload,
+                headers=headers,
+                timeout=task.timeout,
+            )
 
         # Check if it worked
-        if response.status_code == 200:
-            return "SUCCESS"
-        else:
-            return "FAILURE"
-
-    except requests.exceptions.RequestException as e:
-        return f"Error: {e}"
-
-
-def run_healthcheck(target_host, flag):
-    """
-    If the exploit is still unpatched, check the flag is obtainable.
-    """
-    base_url = f"http://{target_host}:5000"
-    flagHash = hashlib.md5(flag.encode()).hexdigest()[:10]
-
-    session = requests.Session()
-
-    try:
-        # Sign up
-        r = session.post(
-            f"{base_url}/login",
-            data={"username": flagHash, "password": flagHash, "action": "register"},
-            timeout=5,
-        )
-        if "Account created" not in r.text and r.status_code != 200:
-            return "FAILURE"
-
-        # Login
-        r = session.post(
-            f"{base_url}/login",
-            data={"username": flagHash, "password": flagHash, "action": "login"},
-            timeout=5,
-        )
-        if "Dashboard" not in r.text:
-            return "FAILURE"
-
-    except Exception as e:
-        return False, f"Auth Error: {e}"
-
-    # Test vulnerability
-    try:
-        r = session.post(
-            f"{base_url}/transfer",
-            data={"recipient": "root", "amount": -5000000},
-            timeout=5,
-        )
+        if response.status_code != 200:
+            raise CheckFailed(f"Flag update rejected with {response.status_code}.")
+
+    def healthcheck(self, task):
+        """
+        If the exploit is still unpatched, check the flag is obtainable.
+        Uses the target's cached session, so each round costs three requests
+        rather than a fresh account and its password hashing.
+        """
+        with self.sessions_lock:
+            s = self.sessions.get(task.ip)
+        if s is None:
+            s = self.login(task)
+
+        # Test vulnerability
+        transferred = self.transfer(task, s, -5000000)
+
+        # The session is gone, e.g. the service restarted with a new secret key
+        if transferred is None:
+            s = self.login(task)
+            transferred = self.transfer(task, s, -5000000)
 
         # If the transfer didn't work, double check it works at all
-        if "Successfully transferred" not in r.text:
-            r = session.post(
-                f"{base_url}/transfer",
-                data={"recipient": "root", "amount": 1},
-                timeout=5,
+        if not transferred and not self.transfer(task, s, 1):
+            raise CheckFailed("Transfers are not working.")
+
+        # Buy the flag, reading the page only until the outcome turns up
+        with task.phase("buy"):
+            r = s.post(f"{task.base_url}/buy/4", timeout=task.timeout, stream=True)
+            found = search(
+                r, task.flag, "Insufficient SkyPoints", timeout=task.timeout
             )
-            if "Successfully transferred" not in r.text:
-                return "FAILURE"
-
-        # Buy the flag
-        r = session.post(f"{base_url}/buy/4", timeout=5)
-
-        if flag in r.text:
-            return "SUCCESS"
 
         # Patched case, user must've fixed the vuln but flag was successfully stored.
-        elif "Insufficient SkyPoints" in r.text:
-            return "SUCCESS"
-        else:
-            return "FAILURE"
-
-    except Exception as e:
-        return e.__str__()
-
-
-@app.route("/inject", methods=["POST"])
-def inject():
-    """
-    API endpoint. Expects JSON:
-    {"ip": "...", "flag": "...", "password": "..."}
-    """
-    data = request.get_json()
-
-    # Check for all required fields including 'password'
-    required_fields = ["ip", "flag", "password"]
-    if not data or not all(field in data for field in required_fields):
-        return (
-            jsonify({"status": "error", "message": "Missing required parameters"}),
-            400,
-        )
-
-    ip = data["ip"]
-    flag = data["flag"]
-    password = data["password"]
-
-    result = inject_flag(ip, flag, password)
-    if result != "SUCCESS":
-        return jsonify({"status": "failure", "message": result})
-
-    # result = run_healthcheck(ip, flag)
-
-    if result == "SUCCESS":
-        return jsonify({"status": "success"})
-    else:
-        return jsonify({"status": "failure", "message": result})
+        if not found:
+            raise CheckFailed("Flag could not be bought.")
+
+    def transfer(self, task, s, amount):
+        """
+        Transfers amount SkyPoints to root. Returns whether it went through,
+        or None if the session was logged out.
+        """
+        with task.phase("transfer"):
+            r = s.post(
+                f"{task.base_url}/transfer",
+                data={"recipient": "root", "amount": amount},
+                timeout=task.timeout,
+                stream=True,
+            )
+            if r.url.endswith("/login"):
+                r.close()
+                return None
+            return bool(search(r, "Successfully transferred", timeout=task.timeout))
+
+    def login(self, task):
+        """
+        Logs the target's healthcheck account in, registering it the first
+        time, and caches the session. The account is derived from the team,
+        so it is created once per session rather than once per round.
+        """
+        accountHash = hashlib.md5(f"{task.ip}:{task.password}".encode()).hexdigest()
+        credentials = {"username": accountHash[:10], "password": accountHash[10:20]}
+
+        s = task.session()
+
+        with task.phase("login"):
+            r = s.post(
+                f"{task.base_url}/login",
+                data={**credentials, "action": "login"},
+                timeout=task.timeout,
+                stream=True,
+            )
+            loggedIn = search(r, "Dashboard", timeout=task.timeout)
+
+        if not loggedIn:
+            # Sign up
+            with task.phase("register"):
+                s.post(
+                    f"{task.base_url}/login",
+                    data={**credentials, "action": "register"},
+                    timeout=task.timeout,
+                )
+
+            with task.phase("login"):
+                r = s.post(
+                    f"{task.base_url}/login",
+                    data={**credentials, "action": "login"},
+                    timeout=task.timeout,
+                    stream=True,
+                )
+                loggedIn = search(r, "Dashboard", timeout=task.timeout)
+            if not loggedIn:
+                raise CheckFailed("Could not log in to the healthcheck account.")
+
+        with self.sessions_lock:
+            self.sessions[task.ip] = s
+        return s
 
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8082)
+    serve("skyrewards", port=8082)
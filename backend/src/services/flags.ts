@@ -1,9 +1,13 @@
 import {db} from './firebase';
-import {Team, FlagResponse, Scenario} from '../types';
+import {Team, Scenario, StreamedFlagResponse} from '../types';
 import {isSessionActive} from './sessions';
 import {FieldValue} from 'firebase-admin/firestore';
 import * as axios from 'axios';
 
+// Seconds each service's round of injections is spread over, so teams see a
+// steady trickle of checks at unpredictable times rather than one burst
+const ROUND_WINDOW = 60;
+
 /**
  * Generates a random flag string with an optional prefix and base64 encoding.
  * Flag is always 16 chars long.
@@ -31,41 +35,75 @@ export function genFlag(prefix: string, base64: boolean): string {
   return flag;
 }
 
-/** Sends a flag to a specified API endpoint using an HTTP POST request.
- * @param {string} endPoint - The URL of the API endpoint to send flag.
- * @param {string} flag - The flag to send.
- * @param {string} ip - The IP address to include in the request payload.
- * @returns {Promise<any>} A promise that resolves with the data from the API response.
- * @throws {Error} Throws an error if the HTTP request fails.
+/**
+ * Submits a whole round of injections to a scoring bot, which spreads them over
+ * ROUND_WINDOW seconds, and reports each verdict as the bot streams it back,
+ * rather than in request order.
+ * Injections the bot never reports on (e.g. if the stream drops) are reported as failures.
+ * @param {string} endPoint - The URL of the bot's stream endpoint.
+ * @param {Array<object>} injections - The ip, flag, optional password and session of each injection.
+ * @param {Function} onResult - Called with each injection's index and whether it succeeded.
+ * @returns {Promise<void>} A promise that resolves once every injection has been reported.
  */
-async function sendFlag(
+async function streamFlags(
   endPoint: string,
-  flag: string,
-  ip: string,
-  password: string,
-): Promise<boolean> {
+  injections: Array<{
+    ip: string;
+    flag: string;
+    password?: string;
+    session: string;
+  }>,
+  onResult: (index: number, success: boolean) => void,
+): Promise<void> {
+  const reported = new Set<number>();
+  const report = (index: number, success: boolean) => {
+    if (reported.has(index) || !(index in injections)) return;
+    reported.add(index);
+    onResult(index, success);
+  };
+
   try {
-    let response;
-    if (!password || password.length === 0) {
-      response = await axios.post<FlagResponse>(endPoint, {
-        ip: ip,
-        flag: flag,
-      });
-    } else {
-      response = await axios.post<FlagResponse>(endPoint, {
-        ip: ip,
-        flag: flag,
-        password: password,
-      });
+    const response = await axios.post(
+      endPoint,
+      {targets: injections, window: ROUND_WINDOW},
+      {responseType: 'stream'},
+    );
+
+    // Results arrive as JSON lines, which may be split across chunks
+    let buffered = '';
+    for await (const chunk of response.data) {
+      buffered += chunk.toString();
+      const lines = buffered.split('\n');
+      buffered = lines.pop() ?? '';
+
+      for (const line of lines) {
+        if (line.trim().length === 0) continue;
+        const result = JSON.parse(line) as StreamedFlagResponse;
+        report(result.index, result.status === 'success');
+      }
     }
+  } catch (_) {}
 
-    if (response.status === 200 && response.data.status === 'success') {
-      return true;
-    }
-    return false;
-  } catch (error) {
-    return false;
-  }
+  injections.forEach((_, index) => report(index, false));
+}
+
+/**
+ * Asks a scoring bot to open keep-alive connections to every team ahead of a round,
+ * so the injections themselves don't pay for the TCP handshake.
+ * Only services that keep connections open benefit; the bot skips teams whose
+ * service closed the connection last time (e.g. Flask's development server).
+ * Bots without a /warm endpoint simply reject the request, which is ignored.
+ * @param {string} endPoint - The URL of the bot's warm endpoint.
+ * @param {Array<string>} ips - The IP addresses of the teams to warm connections to.
+ * @returns {Promise<void>} A promise that resolves once the bot has responded.
+ */
+async function warmService(
+  endPoint: string,
+  ips: Array<string>,
+): Promise<void> {
+  try {
+    await axios.post(endPoint, {ips: ips});
+  } catch (_) {}
 }
 
 /**
@@ -134,13 +172,14 @@ async function updateDown(teamId: string): Promise<void> {
 
 /**
  * The main execution loop. This function runs indefinitely, performing the following steps:
- * 1. Iterates through a list of endpoints.
- * 2. For each endpoint, generates a new flag.
+ * 1. Asks each bot service to pre-warm its connections to teams that keep them open.
+ * 2. For each bot service, generates a new flag for every team.
  * 3. Updates the total flag injection attempts in Firestore.
- * 4. Attempts to inject the flag at the endpoint.
- * 5. If successful, it updates the valid flags in Firestore.
- * 6. If it fails, it increments the team's downCount in Firestore.
- * 7. Waits for a random delay between 2 to 3 minutes before repeating the process.
+ * 4. Submits the service's whole round, spread over ROUND_WINDOW seconds, and streams back each verdict.
+ * 5. As each flag succeeds, it updates the valid flags in Firestore.
+ * 6. As each flag fails, it increments the team's downCount in Firestore.
+ * 7. Waits for a random delay between 2 to 3 minutes before repeating the process,
+ *    without waiting for slow teams' verdicts, which arrive while the next round runs.
  * @param {Array<Team>} teams - An array of Team interfaces.
  * @returns {Promise<void>} This function runs in an infinite loop and does not resolve.
  */
@@ -165,35 +204,51 @@ export async function flagService(
   }
 
   console.log('Flag service started for', teams[0].sessionId);
+  let previousRound: Promise<unknown> = Promise.resolve();
   while (await isSessionActive(teams[0].sessionId)) {
-    for (const team of teams) {
-      if (!team.ipAddress) continue;
-
-      for (const service of services) {
-        const endPoint = `http://${scoringBotIp}:${service.port}/inject`;
-        const flag = genFlag('cybrbtls', false);
-
-        try {
-          await updateTotal(team.id);
-
-          const success = await sendFlag(
-            endPoint,
-            flag,
-            team.ipAddress,
-            team.password,
-          );
-
-          if (!success) throw new Error('Flag injection failed');
-
-          console.log(`[${service.name}] Flag success: ${team.id}`);
-          updateFlag(team.id, flag);
-        } catch (error) {
-          console.error(`[${service.name}] Flag failed: ${team.id} - ${error}`);
-          updateDown(team.id);
-        }
-      }
-    }
+    const ips = teams
+      .map(team => team.ipAddress)
+      .filter((ip): ip is string => !!ip);
+    await Promise.all(
+      services.map(service =>
+        warmService(`http://${scoringBotIp}:${service.port}/warm`, ips),
+      ),
+    );
+
+    // Rounds are pipelined: the bots keep each team's injections in order,
+    // so this round runs on while the delay before the next one starts
+    const targets = teams.filter(team => !!team.ipAddress);
+    const round = Promise.all(
+      services.map(async service => {
+        const flags = targets.map(() => genFlag('cybrbtls', false));
+        await Promise.all(targets.map(team => updateTotal(team.id)));
+
+        await streamFlags(
+          `http://${scoringBotIp}:${service.port}/inject/stream`,
+          targets.map((team, i) => ({
+            ip: team.ipAddress as string,
+            flag: flags[i],
+            session: team.sessionId,
+            ...(team.password ? {password: team.password} : {}),
+          })),
+          (index, success) => {
+            const team = targets[index];
+            if (success) {
+              console.log(`[${service.name}] Flag success: ${team.id}`);
+              updateFlag(team.id, flags[index]);
+            } else {
+              console.error(`[${service.name}] Flag failed: ${team.id}`);
+              updateDown(team.id);
+            }
+          },
+        );
+      }),
+    );
     const delay = Math.floor(Math.random() * (180000 - 120000)) + 120000;
     await sleep(delay);
+
+    // At most two rounds are ever in flight
+    await previousRound;
+    previousRound = round;
   }
 }
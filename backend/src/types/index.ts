@@ -159,3 +159,11 @@ export interface FlagResponse {
   /** If the flag insertion failed, the reason for the failure. */
   message: string | null;
 }
+
+/**
+ * An interface representing one result streamed back from a bot's /inject/stream endpoint.
+ */
+export interface StreamedFlagResponse extends FlagResponse {
+  /** The position of the injection in the submitted round. */
+  index: number;
+}
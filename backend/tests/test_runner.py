@@ -0,0 +1,59 @@
+# Tests for the scoring bots' Runner.
+# Run from backend/ with: python3 -m unittest discover tests
+
+import queue
+import threading
+import unittest
+
+from checker import Checker
+from checker.runner import Runner
+
+
+class DeferredChecker(Checker):
+    name = "deferred"
+    port = 1
+    http = False
+    verify_delay = (0.2, 0.2)
+
+    def __init__(self):
+        self.puts = 0
+        self.put_started = threading.Event()
+        self.release_put = threading.Event()
+
+    def put(self, task):
+        self.puts += 1
+        self.put_started.set()
+        self.release_put.wait(5)
+        return "state"
+
+    def verify(self, task, state):
+        pass
+
+
+class DuplicateInjectionTest(unittest.TestCase):
+    def test_duplicate_follows_deferred_verify(self):
+        checker = DeferredChecker()
+        runner = Runner(checker)
+        fields = {"ip": "10.0.0.1", "flag": "FLAG{duplicate}"}
+
+        verdicts = queue.Queue()
+        original = runner.create_job(fields, listener=verdicts.put)
+        duplicate = runner.create_job(fields, listener=verdicts.put)
+
+        first = runner.submit(fields, original)
+        checker.put_started.wait(5)
+        second = runner.submit(fields, duplicate)
+        checker.release_put.set()
+
+        self.assertEqual(first.result(5), {"status": "pending", "job_id": original})
+        self.assertEqual(second.result(5), {"status": "pending", "job_id": duplicate})
+
+        for _ in range(2):
+            self.assertEqual(verdicts.get(timeout=5)["status"], "success")
+        self.assertEqual(runner.job(original)["status"], "success")
+        self.assertEqual(runner.job(duplicate)["status"], "success")
+        self.assertEqual(checker.puts, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+# Pooled SQLite connections for Cybernote.
+# Opening a connection per query is slow and the default rollback journal
+# makes readers and writers block each other, so connections are kept open
+# and reused, in WAL mode, and wait for a lock instead of failing straight
+# away with "database is locked".
+
+import os
+import sqlite3
+import threading
+
+# Seconds a query waits for a locked database before giving up
+BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", 5))
+
+# Idle connections kept open per database
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 32))
+
+# Pragmas applied to every new connection, separated by ';'
+PRAGMAS = os.environ.get(
+    "DB_PRAGMAS", "synchronous=NORMAL;cache_size=-8000;temp_store=MEMORY"
+)
+
+# Bytes read at a time when streaming a value out of the database
+CHUNK_SIZE = 64 * 1024
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    A connection that close() hands back to its pool instead of closing.
+    Anything not committed by then is rolled back.
+    """
+
+    pool = None
+    checked_out = False
+
+    def close(self):
+        if not self.checked_out:
+            return
+        self.checked_out = False
+        if self.in_transaction:
+            self.rollback()
+        self.pool.release(self)
+
+
+class Pool:
+    """
+    Idle connections to one database. Each thread checks one out while it
+    works, so threads never share a connection, and the most recently used
+    one is handed out first.
+    """
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def get(self):
+        with self.lock:
+            con = self.idle.pop() if self.idle else None
+        if con is None:
+            con = self.open()
+        con.checked_out = True
+        return con
+
+    def release(self, con):
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(con)
+                return
+        sqlite3.Connection.close(con)
+
+    def open(self):
+        # Connections move between threads, but only ever one at a time
+        con = sqlite3.connect(
+            self.path,
+            timeout=BUSY_TIMEOUT,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        con.pool = self
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        for pragma in PRAGMAS.split(";"):
+            if pragma.strip():
+                con.execute(f"PRAGMA {pragma.strip()}")
+        return con
+
+
+def connect(path):
+    """
+    Returns a connection to the database at path from its pool. Call
+    close() when done with it to give it back.
+    """
+    with pools_lock:
+        pool = pools.get(path)
+        if pool is None:
+            pool = pools[path] = Pool(path)
+    return pool.get()
+
+
+def stream(path, table, column, rowid, size=CHUNK_SIZE):
+    """
+    Yields the bytes of a TEXT or BLOB value a chunk at a time, so large
+    values never have to be held in memory whole.
+    """
+    con = connect(path)
+    try:
+        with con.blobopen(table, column, rowid, readonly=True) as blob:
+            while chunk := blob.read(size):
+                yield chunk
+    finally:
+        con.close()